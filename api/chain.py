@@ -1,19 +1,36 @@
 import re
 import random 
 import json
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Callable, Awaitable
 from sqlalchemy.orm import Session
 import google.genai as genai
 from google.genai import types
 from langchain_chroma import Chroma
-from core.config import GEMMA_API_KEY
+from core.config import GEMMA_API_KEY, LLM_TIMEOUT_SECONDS, LLM_HISTORY_TOKEN_BUDGET
 from core.models import ChatMessage, Restaurant, ChatRoom
 from core.geo import calculate_distance
+from core.executor import run_blocking
+from core.metrics import metrics
+from core.llm_gateway import LLMGateway
 from api.saju import _get_oheng_analysis_data
 from saju.message_generator import define_oheng_messages
 from vectordb.vectordb_util import get_embeddings, get_chroma_client, COLLECTION_NAME_RESTAURANTS
+from services.llm_response_cache_service import LLMResponseCacheService
+from services.restaurant_card_service import RestaurantCardService, first_image_url
+from services.chat_state_service import get_chat_state_service
+from services.chat_message_events import (
+    get_history_cache_service,
+    get_pending_chat_messages,
+    serialize_chat_message,
+)
 
-client = genai.Client(api_key=GEMMA_API_KEY)
+client = genai.Client(
+    api_key=GEMMA_API_KEY,
+    http_options=types.HttpOptions(timeout=int(LLM_TIMEOUT_SECONDS * 1000)),
+)
+# 모든 Gemma 호출은 게이트웨이를 거침 (동시성 제한, 재시도, circuit breaker)
+llm_gateway = LLMGateway(client)
 model_name = "gemma-3-4b-it"
 
 embeddings = get_embeddings()
@@ -148,22 +165,99 @@ async def get_initial_chat_message(uid: str, db: Session) -> str:
     return initial_message
 
 
-# 최근 대화 10개를 문자열로 변환
-def build_conversation_history(db: Session, chatroom_id: int) -> str:
-    recent_messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.room_id == chatroom_id)
-        .order_by(ChatMessage.timestamp.desc())
-        .limit(MAX_MESSAGES)
-        .all()
-    )
-    recent_messages.reverse()  # 시간순 정렬
+# 최근 대화 10개 조회 (Redis 링 버퍼 한 번 조회, cold start일 때만 MySQL)
+# 아직 커밋되지 않은 이번 턴의 메시지(사용자 메시지 등)도 뒤에 붙여서 반환
+def get_recent_messages(db: Session, chatroom_id: int) -> List[Dict[str, Any]]:
+    pending_messages = get_pending_chat_messages(db, chatroom_id)
+    pending_ids = {m["id"] for m in pending_messages}
+
+    history_cache_service = get_history_cache_service()
+    cached_messages = history_cache_service.get_recent_messages(chatroom_id)
+    if cached_messages is None:
+        recent_messages = (
+            db.query(ChatMessage)
+            .filter(ChatMessage.room_id == chatroom_id)
+            .order_by(ChatMessage.timestamp.desc())
+            .limit(MAX_MESSAGES + len(pending_messages))
+            .all()
+        )
+        recent_messages.reverse()  # 시간순 정렬
+
+        # 커밋된 메시지만 버퍼에 채움 (pending은 커밋 후 이벤트에서 추가됨)
+        cached_messages = [
+            serialize_chat_message(msg) for msg in recent_messages
+            if msg.id not in pending_ids
+        ]
+        history_cache_service.seed(chatroom_id, cached_messages)
+
+    cached_messages = [m for m in cached_messages if m["id"] not in pending_ids]
+    return (cached_messages + pending_messages)[-MAX_MESSAGES:]
+
+
+# 토큰 수 추정 (토크나이저 없이 UTF-8 바이트 기준)
+# 한글은 글자당 약 1토큰, 영문/숫자는 3~4글자당 1토큰 정도로 약간 넉넉하게 잡음
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 2) // 3
+
+
+# 메시지 타입별로 프롬프트용 한 줄 요약
+def format_history_line(msg: Dict[str, Any]) -> str:
+    message_type = msg.get("message_type") or "text"
+    content = (msg.get("content") or "").strip()
+
+    if msg["role"] == "user":
+        # 위치 선택 태그는 좌표 대신 선택했다는 사실만
+        if content.startswith("[LOCATION_SELECTED:"):
+            return "사용자: (위치 선택)"
+        return f"사용자: {content}"
+
+    if message_type == "restaurant_cards":
+        try:
+            restaurants = json.loads(content).get("restaurants", [])
+        except (ValueError, AttributeError):
+            restaurants = []
+        names = [r.get("name") for r in restaurants if r.get("name")]
+        return f"봇: (식당 추천: {', '.join(names)})" if names else "봇: (식당 추천)"
+
+    if message_type == "location_select":
+        # 위치 입력 안내 문구는 첫 줄만
+        return f"봇: {content.splitlines()[0]}" if content else "봇: (위치 선택 요청)"
+
+    return f"봇: {content}"
+
+
+# 최근 대화를 프롬프트용 문자열로 변환
+# - hidden_initial(오늘의 조언)은 오행 정보가 프롬프트에 따로 들어가므로 제외
+# - 식당 카드는 식당 이름만, 역할(사용자/봇) 표시
+# - 최신 메시지부터 토큰 예산(LLM_HISTORY_TOKEN_BUDGET) 안에서만 포함
+def build_conversation_history(
+    db: Session, chatroom_id: int, token_budget: int = LLM_HISTORY_TOKEN_BUDGET
+) -> str:
+    recent_messages = [
+        dict(msg) for msg in get_recent_messages(db, chatroom_id)
+        if msg.get("message_type") != "hidden_initial"
+    ]
+    # 참조로 저장된 카드는 식당 이름을 얻기 위해 한 번에 채움
+    RestaurantCardService().hydrate_messages(recent_messages, db)
+
+    lines: List[str] = []
+    used_tokens = 0
+    for msg in reversed(recent_messages):
+        line = format_history_line(msg)
+        line_tokens = estimate_tokens(line)
+        if lines and used_tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        used_tokens += line_tokens
+    lines.reverse()
+
+    metrics.observe("llm.history_tokens", used_tokens)
+    metrics.observe("llm.history_messages", len(lines))
+    metrics.incr("llm.history_dropped_messages", len(recent_messages) - len(lines))
 
-    conversation_history = ""
-    for msg in recent_messages:
-        role = "사용자" if msg.role == "user" else "봇"
-        conversation_history += f"{msg.content}\n"
-    return conversation_history
+    return "".join(f"{line}\n" for line in lines)
 
 
 # 식당 목록이 없는 경우 답변
@@ -305,14 +399,7 @@ def search_and_recommend_restaurants(menu_name: str, db: Session, lat: float=Non
 
         distance_m = int(round(distance_km * 1000))
 
-        processed_image_url = None
-        if restaurant.image:
-            imgs = restaurant.image.split(',')
-            first = imgs[0].strip()
-            if first.startswith(("'", '"')) and first.endswith(("'", '"')):
-                first = first[1:-1]
-            if first:
-                processed_image_url = first
+        processed_image_url = first_image_url(restaurant.image)
 
         final_candidates.append({
             "id": restaurant.id,
@@ -364,17 +451,15 @@ def is_initial_recommendation_request(user_message: str, conversation_history: s
     user_message_lower = user_message.lower()
     return any(keyword in user_message_lower for keyword in recommendation_keywords)
 
-# llm 호출 및 응답 반환
-def generate_llm_response(
+# llm 프롬프트 생성
+def build_llm_prompt(
     conversation_history: str, 
     user_message: str, 
     current_recommended_foods: List[str] = None ,
     oheng_info_text: str = ""
     ) -> str:
-    # 지금까지 추천한 메뉴 목록을 문자열로 변환
-    current_foods_str = ', '.join(current_recommended_foods or [])
-    print(f"[DEBUG] current_recommended_foods: {current_foods_str}")
-    
+    # 최근에 고른 메뉴 목록을 문자열로 변환
+    current_foods_str = ', '.join(current_recommended_foods or []) or "없음"
 
     prompt = f"""
     너는 오늘의 운세와 오행 기운에 맞춰 음식을 추천해주는 챗봇 '밥풀이'야. 
@@ -387,6 +472,9 @@ def generate_llm_response(
     이 오행 정보를 기반으로 사용자의 균형을 맞춰줄 수 있는 음식을 추천해야 해.
     
     
+    --- 최근에 고른 음식 ---
+    {current_foods_str}
+
     --- 대화 기록 ---
     {conversation_history}
 
@@ -400,23 +488,129 @@ def generate_llm_response(
     3) 음식 추천과 상관없는 대화라면 자연스럽게 음식이야기로 유도한다.
     4) '@밥풀' 멘션을 언급하지 않고 자연스럽게 답변한다.
     5) 음식을 추천할 때는 3개씩 추천한다.
+    6) 사용자가 다시 원하지 않는 한 '최근에 고른 음식'은 추천에서 제외한다.
     
     
     """
+    metrics.observe("llm.prompt_tokens", estimate_tokens(prompt))
+    return prompt
+
 
-    response = client.models.generate_content(
+# llm 비동기 호출 (client.aio) - provider 응답을 기다리는 동안 스레드를 점유하지 않음
+async def generate_llm_response_async(
+    conversation_history: str, 
+    user_message: str, 
+    current_recommended_foods: List[str] = None ,
+    oheng_info_text: str = ""
+    ) -> str:
+    prompt = build_llm_prompt(
+        conversation_history,
+        user_message,
+        current_recommended_foods=current_recommended_foods,
+        oheng_info_text=oheng_info_text,
+    )
+
+    response = await llm_gateway.agenerate_content(
         model=model_name,
         contents=[prompt],
         config=types.GenerateContentConfig(temperature=0.7)
     )
 
-    llm_response_text = response.text.strip()
-        
-    return llm_response_text
+    return response.text.strip()
+
+
+# llm 비동기 스트리밍 호출
+async def stream_llm_response_async(
+    conversation_history: str, 
+    user_message: str, 
+    current_recommended_foods: List[str] = None ,
+    oheng_info_text: str = ""
+    ) -> AsyncIterator[str]:
+    prompt = build_llm_prompt(
+        conversation_history,
+        user_message,
+        current_recommended_foods=current_recommended_foods,
+        oheng_info_text=oheng_info_text,
+    )
+
+    response_stream = llm_gateway.astream_content(
+        model=model_name,
+        contents=[prompt],
+        config=types.GenerateContentConfig(temperature=0.7)
+    )
+
+    try:
+        async for chunk in response_stream:
+            if chunk.text:
+                yield chunk.text
+    finally:
+        # 중간에 그만두면 게이트웨이 호출 슬롯을 바로 반납
+        await response_stream.aclose()
+
+
+# 스트리밍 중 화면에 보여줘도 되는 부분만 반환
+# [MENU_SELECTED:xxx] 태그(또는 태그가 될 수 있는 미완성 조각)가 시작되는 위치부터는 보류
+def get_streamable_text(text: str) -> str:
+    tag_prefix = "[MENU_SELECTED:"
+    idx = text.find("[")
+    while idx != -1:
+        if tag_prefix.startswith(text[idx:idx + len(tag_prefix)]):
+            return text[:idx]
+        idx = text.find("[", idx + 1)
+    return text
+
+
+# 진행 중인 동일 LLM 호출 {요청 digest: Future}
+_inflight_llm_calls: Dict[str, asyncio.Future] = {}
+
+# 캐시된 응답이 있으면 바로 반환하고, 같은 요청이 이미 진행 중이면 그 결과를 함께 기다림
+# generate: 실제 LLM 호출 코루틴을 만드는 함수 (일반 호출 / 스트리밍 모두 사용)
+async def get_or_generate_llm_response(
+    generate: Callable[[], Awaitable[str]],
+    conversation_history: str,
+    user_message: str,
+    current_recommended_foods: List[str] = None,
+    oheng_info_text: str = "",
+) -> str:
+    cache_service = LLMResponseCacheService()
+    digest = cache_service.build_digest(
+        conversation_history,
+        user_message,
+        current_recommended_foods=current_recommended_foods,
+        oheng_info_text=oheng_info_text,
+    )
 
+    cached_response = await run_blocking(cache_service.get_response, digest)
+    if cached_response:
+        metrics.incr("llm.response_cache.hit")
+        return cached_response
 
+    inflight = _inflight_llm_calls.get(digest)
+    if inflight is not None:
+        metrics.incr("llm.response_cache.coalesced")
+        return await asyncio.shield(inflight)
 
-def generate_intent(user_message):
+    metrics.incr("llm.response_cache.miss")
+    future = asyncio.get_running_loop().create_future()
+    _inflight_llm_calls[digest] = future
+    try:
+        response_text = await generate()
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(e)
+            future.exception()  # 기다리는 호출이 없어도 경고가 남지 않도록 확인 처리
+        raise
+    finally:
+        _inflight_llm_calls.pop(digest, None)
+
+    future.set_result(response_text)
+    await run_blocking(cache_service.set_response, digest, response_text)
+    return response_text
+
+
+def build_intent_prompt(user_message) -> str:
     prompt = f"""
     너는 사용자의 메시지를 분석해 intent와 menu를 결정하는 시스템이다.
 
@@ -430,25 +624,24 @@ def generate_intent(user_message):
     출력은 반드시 다음 형식:
     intent="..."; menu="..."
     """
+    return prompt
 
-    response = client.models.generate_content(
+
+async def generate_intent_async(user_message):
+    prompt = build_intent_prompt(user_message)
+
+    response = await llm_gateway.agenerate_content(
         model=model_name,
         contents=[prompt]
     )
     return response.text.strip()
 
 
-def get_latest_recommended_foods(db: Session, room_id: int) -> List[str]:
+def get_latest_recommended_foods(db: Session, room_id: int, chatroom: ChatRoom = None) -> List[str]:
     """
-    최근 추천된 음식 목록을 ChatRoom(selected_menu 또는 별도 테이블)에 저장해두고
-    여기서 다시 불러오는 구조라면 이 함수가 필요함.
-    다만 네 구조상 selected_menu 만 저장되므로,
-    일단 selected_menu만 리스트로 감싸서 반환하도록 작성해둔다.
+    Redis 대화 상태(chatroom:state)에서 최근에 고른 음식 목록(suggested_foods, 오래된 순)을 반환.
+    상태가 없을 때만 ChatRoom.selected_menu 기록으로 채우고,
+    이미 조회한 chatroom을 넘기면 다시 조회하지 않음.
     """
-
-    chatroom = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
-
-    if not chatroom or not chatroom.selected_menu:
-        return []
-
-    return [chatroom.selected_menu]
+    state = get_chat_state_service().get_state(room_id, chatroom, db)
+    return state["suggested_foods"]
@@ -1,22 +1,61 @@
 import re
 import json
+import time
+import uuid
+import asyncio
 import datetime
 import pytz
 import logging
+from itertools import islice
 from typing import Optional, List, Dict, Any
 
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 
-from core.db import get_db
+from core.config import (
+    CHAT_STREAMING_ENABLED,
+    CHAT_TURN_MODE,
+    CHAT_EXPORT_CHUNK_SIZE,
+    LLM_DEADLINE_SECONDS,
+)
+from core.db import SessionLocal, get_db, session_scope
 from core.models import ChatRoom, ChatMessage, ChatroomMember, User
 from core.firebase_auth import verify_firebase_token, get_user_uid_from_websocket_token
 from core.websocket_manager import ConnectionManager, get_connection_manager
+from core.ws_frames import negotiate_encoding
+from core.executor import run_blocking
+from core.room_queue import RoomWorkQueue, get_room_queue
+from core.metrics import metrics
+from core.mention_debouncer import MentionDebouncer, get_mention_debouncer
+from services.chat_message_events import (
+    get_history_cache_service,
+    get_stream_service,
+    get_unread_service,
+)
+from services.chat_membership_cache_service import ChatMembershipCacheService
+from services.chat_turn_queue_service import get_turn_queue_service
+from services.idempotency_service import IdempotencyService
+from services.user_cache_service import UserCacheService
+from services.chat_archive_service import ChatArchiveService
+from services.restaurant_card_service import RestaurantCardService, build_card_reference
+from services.chat_state_service import (
+    STAGE_IDLE,
+    STAGE_MENU_SELECTED,
+    STAGE_RECOMMENDED,
+    get_chat_state_service,
+    push_suggested_food,
+    queue_state_update,
+)
 
 from api.chain import (
     build_conversation_history,
-    generate_llm_response,
+    generate_llm_response_async,
+    stream_llm_response_async,
+    get_or_generate_llm_response,
+    get_streamable_text,
     get_initial_chat_message,
     search_and_recommend_restaurants,
     get_latest_recommended_foods,
@@ -28,6 +67,9 @@ from saju.message_generator import define_oheng_messages
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = logging.getLogger(__name__)
 
+# 그룹방에서 챗봇을 부르는 멘션
+MENTION_TAG = "@밥풀이"
+
 # KST 시간대 정의 (UTC+9)
 KST = pytz.timezone("Asia/Seoul")
 UTC = pytz.timezone("UTC")
@@ -51,21 +93,36 @@ Chat_rooms: Dict[str, list] = {}
 # 메뉴 / 위치 선택 관련 유틸
 # -------------------------------
 
-def get_latest_selected_menu(db: Session, room_id: int) -> Optional[str]:
+def get_latest_selected_menu(db: Session, room_id: int, chatroom: ChatRoom = None) -> Optional[str]:
     """
-    ChatRoom에 저장된 가장 최근 선택 메뉴(selected_menu) 조회
+    Redis 대화 상태에서 가장 최근 선택 메뉴(selected_menu) 조회
+    (상태가 없을 때만 ChatRoom 기록에서 채움)
     """
-    chatroom = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
-    if chatroom:
-        return chatroom.selected_menu
-    return None
+    return get_chat_state_service().get_state(room_id, chatroom, db)["selected_menu"]
+
+
+def new_assistant_message(
+    room_id: int, content: str, message_type: str = "text", offset_seconds: int = 0
+) -> ChatMessage:
+    """
+    봇 메시지 객체 생성 (저장은 호출한 쪽의 flush / commit에서)
+    """
+    return ChatMessage(
+        room_id=room_id,
+        sender_id="assistant",
+        role="assistant",
+        content=content,
+        message_type=message_type,
+        timestamp=datetime.datetime.utcnow() + datetime.timedelta(seconds=offset_seconds),
+    )
 
 
 def process_menu_selection(db: Session, chatroom: ChatRoom, llm_output: str) -> Optional[dict]:
     """
     LLM 응답에서 [MENU_SELECTED:xxx] 태그를 찾아서,
     - chatroom.selected_menu에 저장
-    - 위치 선택을 위한 location_select 타입 메시지를 하나 생성 & 저장
+    - 위치 선택을 위한 location_select 타입 메시지를 하나 생성 & flush
+    커밋은 턴 전체를 묶어서 호출한 쪽에서 한 번만 한다.
     """
     menu_name_match = re.search(r"\[MENU_SELECTED:(.+?)\]", llm_output)
     if not menu_name_match:
@@ -73,10 +130,16 @@ def process_menu_selection(db: Session, chatroom: ChatRoom, llm_output: str) ->
 
     selected_menu = menu_name_match.group(1).strip()
 
-    # ChatRoom에 선택 메뉴 저장
+    # 대화 상태 갱신 (커밋 후 Redis 반영), ChatRoom에는 기록용으로 저장
+    state = get_chat_state_service().get_state(chatroom.id, chatroom)
+    queue_state_update(
+        db,
+        chatroom.id,
+        stage=STAGE_MENU_SELECTED,
+        selected_menu=selected_menu,
+        suggested_foods=push_suggested_food(state["suggested_foods"], selected_menu),
+    )
     chatroom.selected_menu = selected_menu
-    db.add(chatroom)
-    db.commit()
 
     # 위치 선택 프롬프트 메시지 생성
     assistant_reply = (
@@ -85,21 +148,11 @@ def process_menu_selection(db: Session, chatroom: ChatRoom, llm_output: str) ->
     )
     message_type = "location_select"
 
-    assistant_message = ChatMessage(
-        room_id=chatroom.id,
-        sender_id="assistant",
-        role="assistant",
-        content=assistant_reply,
-        message_type=message_type,
-        timestamp=datetime.datetime.utcnow(),
-    )
+    assistant_message = new_assistant_message(chatroom.id, assistant_reply, message_type)
     db.add(assistant_message)
-    db.commit()
-    db.refresh(assistant_message)
+    db.flush()
 
     chatroom.last_message_id = assistant_message.id
-    db.add(chatroom)
-    db.commit()
 
     return {
         "id": assistant_message.id,
@@ -119,7 +172,7 @@ def process_location_selection_tag(
     [LOCATION_SELECTED:TYPE]|lat|lon 태그 처리.
     - ChatRoom.selected_menu로부터 메뉴명 읽고
     - search_and_recommend_restaurants(menu, db, lat, lon) 호출
-    - DB에 initial / restaurant_cards / final 메시지 3개 저장
+    - DB에 initial / restaurant_cards / final 메시지 3개 flush (커밋은 호출한 쪽에서)
     - 프론트로 보낼 수 있는 reply 구조 반환
     """
 
@@ -134,9 +187,10 @@ def process_location_selection_tag(
     lat = float(match.group(2))
     lon = float(match.group(3))
 
-    selected_menu = get_latest_selected_menu(db, chatroom.id)
+    selected_menu = get_latest_selected_menu(db, chatroom.id, chatroom)
+    last_location = {"type": action_type, "lat": lat, "lon": lon}
 
-    print(f"[DEBUG] LOCATION_SELECTED 처리: action={action_type}, menu={selected_menu}, lat={lat}, lon={lon}")
+    logger.debug(f"LOCATION_SELECTED 처리 (room {chatroom.id}): action={action_type}, menu={selected_menu}")
 
     # 식당 검색
     restaurant_data = search_and_recommend_restaurants(selected_menu, db, lat, lon)
@@ -150,23 +204,16 @@ def process_location_selection_tag(
             "조건에 맞는 행운의 맛집을 찾지 못했어. 다른 메뉴나 위치로 다시 시도해볼까?",
         )
 
-        no_result_message = ChatMessage(
-            room_id=chatroom.id,
-            sender_id="assistant",
-            role="assistant",
-            content=no_result_msg,
-            message_type="text",
-            timestamp=datetime.datetime.utcnow(),
-        )
+        no_result_message = new_assistant_message(chatroom.id, no_result_msg)
         db.add(no_result_message)
-        db.commit()
-        db.refresh(no_result_message)
+        db.flush()
 
         # 상태 초기화
+        queue_state_update(
+            db, chatroom.id, stage=STAGE_IDLE, selected_menu=None, last_location=last_location
+        )
         chatroom.selected_menu = None
         chatroom.last_message_id = no_result_message.id
-        db.add(chatroom)
-        db.commit()
 
         return {
             "replies": [
@@ -181,11 +228,12 @@ def process_location_selection_tag(
         }
 
     # 검색 결과 있음
-    print(f"[DEBUG] 식당 검색 성공: {len(restaurants)}개 발견")
+    logger.debug(f"식당 검색 성공 (room {chatroom.id}): {len(restaurants)}개 발견")
 
+    queue_state_update(
+        db, chatroom.id, stage=STAGE_RECOMMENDED, selected_menu=None, last_location=last_location
+    )
     chatroom.selected_menu = None
-    db.add(chatroom)
-    db.commit()
 
     initial_msg_content = restaurant_data.get(
         "initial_message",
@@ -196,53 +244,25 @@ def process_location_selection_tag(
         "다른 행운의 맛집도 추천해줄까?",
     )
 
-    card_data = {
-        "restaurants": restaurants,
-        "count": restaurant_data.get("count", len(restaurants)),
-    }
-    card_msg_content = json.dumps(card_data, ensure_ascii=False)
-
-    # 1) initial text
-    initial_message = ChatMessage(
-        room_id=chatroom.id,
-        sender_id="assistant",
-        role="assistant",
-        content=initial_msg_content,
-        message_type="text",
-        timestamp=datetime.datetime.utcnow(),
+    # 카드 메시지에는 식당 id / 거리 / 순위만 저장하고, 내려줄 때 요약 캐시로 채움
+    card_ref_content = build_card_reference(
+        restaurants, restaurant_data.get("count", len(restaurants))
     )
-    db.add(initial_message)
+    card_msg_content = RestaurantCardService().hydrate_content(card_ref_content, db)
 
-    # 2) restaurant_cards
-    card_message = ChatMessage(
-        room_id=chatroom.id,
-        sender_id="assistant",
-        role="assistant",
-        content=card_msg_content,
-        message_type="restaurant_cards",
-        timestamp=datetime.datetime.utcnow() + datetime.timedelta(seconds=1),
+    # 1) initial text / 2) restaurant_cards / 3) final text
+    # 세 메시지를 한 번의 flush로 저장해 id를 함께 받음
+    initial_message = new_assistant_message(chatroom.id, initial_msg_content)
+    card_message = new_assistant_message(
+        chatroom.id, card_ref_content, "restaurant_cards", offset_seconds=1
     )
-    db.add(card_message)
-
-    # 3) final text
-    final_message = ChatMessage(
-        room_id=chatroom.id,
-        sender_id="assistant",
-        role="assistant",
-        content=final_msg_content,
-        message_type="text",
-        timestamp=datetime.datetime.utcnow() + datetime.timedelta(seconds=2),
+    final_message = new_assistant_message(
+        chatroom.id, final_msg_content, offset_seconds=2
     )
-    db.add(final_message)
-
-    db.commit()
-    db.refresh(initial_message)
-    db.refresh(card_message)
-    db.refresh(final_message)
+    db.add_all([initial_message, card_message, final_message])
+    db.flush()
 
     chatroom.last_message_id = final_message.id
-    db.add(chatroom)
-    db.commit()
 
     return {
         "replies": [
@@ -327,19 +347,17 @@ async def handle_restaurant_recommendation(
 
     await manager.broadcast(
         room_id,
-        json.dumps(
-            {
-                "type": "new_message",
-                "message": {
-                    "id": initial_message.id,
-                    "role": "assistant",
-                    "sender_name": "밥풀이",
-                    "content": initial_msg_content,
-                    "message_type": "text",
-                    "timestamp": initial_message.timestamp.isoformat(),
-                },
-            }
-        ),
+        {
+            "type": "new_message",
+            "message": {
+                "id": initial_message.id,
+                "role": "assistant",
+                "sender_name": "밥풀이",
+                "content": initial_msg_content,
+                "message_type": "text",
+                "timestamp": initial_message.timestamp.isoformat(),
+            },
+        },
     )
 
     card_data = {
@@ -360,19 +378,17 @@ async def handle_restaurant_recommendation(
 
     await manager.broadcast(
         room_id,
-        json.dumps(
-            {
-                "type": "new_message",
-                "message": {
-                    "id": card_message.id,
-                    "role": "assistant",
-                    "sender_name": "밥풀이",
-                    "content": card_msg_content,
-                    "message_type": "restaurant_cards",
-                    "timestamp": card_message.timestamp.isoformat(),
-                },
-            }
-        ),
+        {
+            "type": "new_message",
+            "message": {
+                "id": card_message.id,
+                "role": "assistant",
+                "sender_name": "밥풀이",
+                "content": card_msg_content,
+                "message_type": "restaurant_cards",
+                "timestamp": card_message.timestamp.isoformat(),
+            },
+        },
     )
 
     final_msg_content = restaurant_data.get("final_message")
@@ -390,19 +406,17 @@ async def handle_restaurant_recommendation(
 
     await manager.broadcast(
         room_id,
-        json.dumps(
-            {
-                "type": "new_message",
-                "message": {
-                    "id": final_message.id,
-                    "role": "assistant",
-                    "sender_name": "밥풀이",
-                    "content": final_msg_content,
-                    "message_type": "text",
-                    "timestamp": final_message.timestamp.isoformat(),
-                },
-            }
-        ),
+        {
+            "type": "new_message",
+            "message": {
+                "id": final_message.id,
+                "role": "assistant",
+                "sender_name": "밥풀이",
+                "content": final_msg_content,
+                "message_type": "text",
+                "timestamp": final_message.timestamp.isoformat(),
+            },
+        },
     )
 
     chatroom.last_message_id = final_message.id
@@ -411,25 +425,142 @@ async def handle_restaurant_recommendation(
 
 
 # -------------------------------
-# WebSocket 메시지 처리
+# LLM 응답 스트리밍
 # -------------------------------
 
-async def handle_websocket_message(
+async def stream_llm_reply(
     room_id: int,
-    uid: str,
-    user: User,
-    message_content: str,
-    db: Session,
     manager: ConnectionManager,
-):
+    stream_id: str,
+    conversation_history: str,
+    user_message: str,
+    current_recommended_foods: List[str],
+    oheng_info_text: str,
+) -> str:
+    """
+    LLM 응답을 생성되는 대로 assistant_delta 프레임으로 브로드캐스트하고,
+    태그 감지 / 저장에 쓸 전체 텍스트를 반환한다.
+    - [MENU_SELECTED:xxx] 태그 부분은 delta로 내보내지 않음
+    - 최종 메시지는 같은 stream_id를 담은 new_message로 따로 브로드캐스트
+    """
+    chunks = stream_llm_response_async(
+        conversation_history,
+        user_message,
+        current_recommended_foods=current_recommended_foods,
+        oheng_info_text=oheng_info_text,
+    )
+
+    llm_output = ""
+    sent_length = 0
+    try:
+        async for chunk in chunks:
+            llm_output += chunk
+            visible_text = get_streamable_text(llm_output.lstrip())
+            if len(visible_text) > sent_length:
+                await manager.broadcast(
+                    room_id,
+                    {
+                        "type": "assistant_delta",
+                        "stream_id": stream_id,
+                        "delta": visible_text[sent_length:],
+                    },
+                )
+                sent_length = len(visible_text)
+    finally:
+        # 중간에 실패해도 스트림(게이트웨이 호출 슬롯)을 바로 정리
+        await chunks.aclose()
+
+    return llm_output.strip()
+
+
+# -------------------------------
+# 턴 준비 (LLM 호출 전 단계)
+# -------------------------------
+
+async def _timed_stage(name: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        metrics.observe(f"chat.turn.{name}_ms", (time.perf_counter() - started) * 1000)
+
+
+# 오행 정보 문자열 (오늘의 일진 계산 포함)
+# 일진 계산이 세션을 커밋할 수 있어 턴의 세션과 분리된 자체 세션 사용
+async def load_oheng_info_text(uid: str) -> str:
+    db = SessionLocal()
+    try:
+        lacking_oheng, strong_oheng_db, oheng_type, oheng_scores = (
+            await _get_oheng_analysis_data(uid, db)
+        )
+    finally:
+        await run_blocking(db.close)
+
+    (
+        headline,
+        advice,
+        recommended_ohengs_weights,
+        control_ohengs,
+        strong_ohengs,
+    ) = define_oheng_messages(
+        lacking_oheng,
+        strong_oheng_db,
+        oheng_type,
+        oheng_scores
+    )
+
+    return f"""
+    부족한 오행: {", ".join(lacking_oheng)}
+    강한 오행: {", ".join(strong_ohengs)}
+    조절 오행: {", ".join(control_ohengs)}
+    """
+
+
+async def build_turn_context(db: Session, room_id: int, chatroom: ChatRoom, uid: str) -> tuple:
+    """
+    (대화 기록, 최근 추천 음식, 오행 정보) 를 동시에 준비
+    - 대화 기록: 아직 커밋 전인 이번 턴 메시지가 보여야 하므로 턴의 세션 사용
+    - 추천 음식: Redis 대화 상태 (캐시 miss여도 이미 로드된 chatroom만 사용, 세션 사용 안 함)
+    - 오행 정보: 자체 세션
+    전체 대기 시간은 가장 느린 단계 정도, 단계별 시간은 chat.turn.*_ms 지표로 기록
+    """
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        _timed_stage("history", run_blocking(build_conversation_history, db, room_id)),
+        _timed_stage("foods", run_blocking(get_latest_recommended_foods, None, room_id, chatroom)),
+        _timed_stage("oheng", load_oheng_info_text(uid)),
+        # 하나가 실패해도 나머지(턴 세션을 쓰는 스레드 포함)가 끝난 뒤에 실패 처리
+        return_exceptions=True,
+    )
+    metrics.observe("chat.turn.context_ms", (time.perf_counter() - started) * 1000)
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return tuple(results)
+
+
+# -------------------------------
+# WebSocket 메시지 처리
+# -------------------------------
+
+# 아래 동기 함수들은 이벤트 루프를 막지 않도록 run_blocking으로 실행
+# 한 턴의 저장은 flush로 id만 받고, 턴 끝에 commit 한 번으로 묶음
+
+def save_user_message(
+    db: Session, room_id: int, uid: str, message_content: str
+) -> Optional[tuple]:
+    """
+    채팅방 조회 + 사용자 메시지 flush. 채팅방이 없으면 None
+    """
     chatroom = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
     if not chatroom:
-        return
+        return None
 
-    # LOCATION_SELECTED 여부 먼저 확인
-    is_location_message = message_content.startswith("[LOCATION_SELECTED:")
+    # 아카이브된 방이면 LLM 대화 기록이 이어지도록 메시지를 먼저 핫 테이블로 복원
+    if chatroom.archived_at:
+        ChatArchiveService().restore_room(db, chatroom)
 
-    # 사용자 메시지 저장
     chat_message = ChatMessage(
         room_id=room_id,
         sender_id=uid,
@@ -438,237 +569,530 @@ async def handle_websocket_message(
         timestamp=datetime.datetime.utcnow(),
     )
     db.add(chat_message)
-    db.commit()
-    db.refresh(chat_message)
+    db.flush()
+    return chatroom, chat_message
 
-    sender_profile_url = user.profile_image
 
-    # LOCATION_SELECTED는 프론트에 그대로 보여줄 필요 없으니 브로드캐스트 생략
-    if not is_location_message:
-        user_msg_json = chat_message_to_json(
-            chat_message, user.nickname, uid, sender_profile_url
+def add_assistant_message(
+    db: Session, chatroom: ChatRoom, content: str, message_type: str = "text"
+) -> ChatMessage:
+    """
+    봇 메시지 flush + chatroom.last_message_id 갱신
+    """
+    assistant_message = new_assistant_message(chatroom.id, content, message_type)
+    db.add(assistant_message)
+    db.flush()
+
+    chatroom.last_message_id = assistant_message.id
+    return assistant_message
+
+
+def commit_turn(db: Session):
+    """
+    턴 전체를 한 번에 커밋, 실패하면 롤백
+    """
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+async def retract_unsaved_message(
+    room_id: int, message: ChatMessage, message_id: int, manager: ConnectionManager
+):
+    """
+    사용자 메시지는 flush 직후(턴 커밋 전)에 브로드캐스트하므로,
+    롤백으로 저장되지 않았으면 클라이언트가 화면에서 지우도록 message_retracted 전송
+    (롤백 후 호출 - 이미 커밋된 메시지는 persistent로 남아 있어 그대로 둠)
+    """
+    if sa_inspect(message).persistent:
+        return
+    await manager.broadcast(room_id, {"type": "message_retracted", "message_id": message_id})
+
+
+def bot_message_frame(message: ChatMessage, uid: str, stream_id: Optional[str] = None) -> dict:
+    frame = {"type": "new_message", "message": chat_message_to_json(message, "밥풀이", uid)}
+    if stream_id:
+        frame["stream_id"] = stream_id
+    return frame
+
+
+async def broadcast_turn_error(room_id: int, manager: ConnectionManager):
+    await manager.broadcast(
+        room_id,
+        {
+            "type": "error",
+            "message": "서버에서 오류가 발생했어 😭 다시 시도해줘!",
+        },
+    )
+
+
+async def generate_llm_reply(
+    db: Session,
+    room_id: int,
+    chatroom: ChatRoom,
+    uid: str,
+    user_message_for_llm: str,
+    manager: ConnectionManager,
+):
+    """
+    대화 기록 / 추천 음식 / 오행 정보로 LLM 답변 생성 → 봇 메시지 저장 → 커밋 후 브로드캐스트
+    준비 단계나 LLM 호출이 실패하면 지금까지 저장한 사용자 메시지만 커밋하고 오류 메시지를 보냄
+    """
+    # 스트리밍 delta와 최종 메시지를 묶어주는 id
+    stream_id = uuid.uuid4().hex
+
+    try:
+        # 대화 기록 / 추천 음식 / 오행 정보는 서로 독립적이라 동시에 준비
+        conversation_history, current_foods, oheng_info_text = await build_turn_context(
+            db, room_id, chatroom, uid
         )
-        await manager.broadcast(
-            room_id,
-            json.dumps({"type": "new_message", "message": user_msg_json}),
+
+        # 메시지 / 대화 내용은 남기지 않고 크기만 기록
+        logger.debug(
+            f"LLM 호출 (room {room_id}): message {len(user_message_for_llm)}자, "
+            f"history {len(conversation_history)}자"
         )
 
-    # 1) LOCATION_SELECTED 처리 (LLM 호출 전에)
-    if is_location_message:
-        location_result = process_location_selection_tag(
-            db, chatroom, message_content, chat_message.id
+        if CHAT_STREAMING_ENABLED:
+            generate = lambda: stream_llm_reply(
+                room_id,
+                manager,
+                stream_id,
+                conversation_history,
+                user_message_for_llm,
+                current_recommended_foods=current_foods,
+                oheng_info_text=oheng_info_text,
+            )
+        else:
+            generate = lambda: generate_llm_response_async(
+                conversation_history,
+                user_message_for_llm,
+                current_recommended_foods=current_foods,
+                oheng_info_text=oheng_info_text,
+            )
+
+        # 같은 요청의 캐시된 응답 / 진행 중인 호출이 있으면 재사용
+        llm_output = await get_or_generate_llm_response(
+            generate,
+            conversation_history,
+            user_message_for_llm,
+            current_recommended_foods=current_foods,
+            oheng_info_text=oheng_info_text,
+        )
+
+        logger.debug(f"LLM 응답 (room {room_id}): {len(llm_output)}자")
+
+    except Exception as llm_error:
+        logger.exception(f"LLM 호출 오류 (room {room_id}): {llm_error}")
+        # 사용자 메시지는 저장
+        await run_blocking(commit_turn, db)
+        await manager.broadcast(
+            room_id,
+            {
+                "type": "new_message",
+                "stream_id": stream_id,
+                "message": {
+                    "role": "assistant",
+                    "sender_name": "밥풀이",
+                    "content": "잠깐 오류났어 😅 다시 한번 말해줄래?",
+                    "message_type": "text",
+                },
+            },
         )
-        if location_result and location_result.get("replies"):
-            for reply_msg in location_result["replies"]:
-                db_message = (
-                    db.query(ChatMessage)
-                    .filter(ChatMessage.id == reply_msg["id"])
-                    .first()
-                )
-                if db_message:
-                    bot_msg_json = chat_message_to_json(
-                        db_message, "밥풀이", uid
-                    )
-                    await manager.broadcast(
-                        room_id,
-                        json.dumps(
-                            {"type": "new_message", "message": bot_msg_json}
-                        ),
-                    )
         return
 
-    # 2) 챗봇 호출 여부
-    MENTION_TAG = "@밥풀이"
-    is_llm_triggered = (not chatroom.is_group) or (
-        chatroom.is_group and MENTION_TAG in message_content
+    # LLM 응답에 MENU_SELECTED 태그가 있는 경우 → 위치 선택 단계로
+    location_select_reply = await run_blocking(
+        process_menu_selection, db, chatroom, llm_output
     )
+    if location_select_reply:
+        assistant_message = db.get(ChatMessage, location_select_reply["id"])
+    else:
+        # 일반 텍스트 응답
+        assistant_message = await run_blocking(
+            add_assistant_message, db, chatroom, llm_output
+        )
 
-    if not is_llm_triggered:
-        chatroom.last_message_id = chat_message.id
-        db.add(chatroom)
-        db.commit()
+    reply_frame = bot_message_frame(assistant_message, uid, stream_id)
+
+    await run_blocking(commit_turn, db)
+    await manager.broadcast(room_id, reply_frame)
+
+
+async def handle_websocket_message(
+    room_id: int,
+    uid: str,
+    user: User,
+    message_content: str,
+    db: Session,
+    manager: ConnectionManager,
+    mention_debouncer: MentionDebouncer = None,
+):
+    # LOCATION_SELECTED 여부 먼저 확인
+    is_location_message = message_content.startswith("[LOCATION_SELECTED:")
+
+    # 사용자 메시지 저장 (flush로 id만 받음)
+    saved = await run_blocking(save_user_message, db, room_id, uid, message_content)
+    if not saved:
         return
+    chatroom, chat_message = saved
+    # 롤백되면 객체에서 id를 믿을 수 없으므로 미리 보관
+    user_message_id = chat_message.id
+
+    sender_profile_url = user.profile_image
+
+    # LOCATION_SELECTED는 프론트에 그대로 보여줄 필요 없으니 브로드캐스트 생략
+    if not is_location_message:
+        user_msg_json = chat_message_to_json(
+            chat_message, user.nickname, uid, sender_profile_url
+        )
+        await manager.broadcast(
+            room_id,
+            {"type": "new_message", "message": user_msg_json},
+        )
 
-    # 3) LLM 호출
     try:
+        # 1) LOCATION_SELECTED 처리 (LLM 호출 전에)
+        if is_location_message:
+            # 커밋 후 브로드캐스트할 봇 메시지 프레임
+            reply_frames: List[dict] = []
+            location_result = await run_blocking(
+                process_location_selection_tag,
+                db, chatroom, message_content, chat_message.id
+            )
+            for reply_msg in (location_result or {}).get("replies", []):
+                # flush된 객체라 identity map에서 바로 가져옴 (추가 쿼리 없음)
+                db_message = db.get(ChatMessage, reply_msg["id"])
+                if db_message:
+                    # 카드는 저장된 참조 대신 채워진 content로 전송
+                    frame = bot_message_frame(db_message, uid)
+                    frame["message"]["content"] = reply_msg["content"]
+                    reply_frames.append(frame)
+
+            await run_blocking(commit_turn, db)
+            for frame in reply_frames:
+                await manager.broadcast(room_id, frame)
+            return
+
+        # 2) 챗봇 호출 여부
+        is_llm_triggered = (not chatroom.is_group) or (
+            chatroom.is_group and MENTION_TAG in message_content
+        )
+
+        if not is_llm_triggered:
+            chatroom.last_message_id = chat_message.id
+            await run_blocking(commit_turn, db)
+            return
+
         user_message_for_llm = (
             message_content.replace(MENTION_TAG, "").strip()
             if chatroom.is_group
             else message_content
         )
 
-        conversation_history = build_conversation_history(db, room_id)
+        # 그룹방 멘션은 바로 답하지 않고 debounce 시간 동안 모아서 한 번에 답변
+        if chatroom.is_group and mention_debouncer and mention_debouncer.enabled:
+            chatroom.last_message_id = chat_message.id
+            await run_blocking(commit_turn, db)
+            mention_debouncer.add(
+                room_id,
+                {"uid": uid, "nickname": user.nickname, "content": user_message_for_llm},
+                lambda target_room_id, mentions: process_coalesced_mentions(
+                    target_room_id, mentions, manager
+                ),
+            )
+            return
 
-        print("\n============================")
-        print("📩 USER MESSAGE:", user_message_for_llm)
-        print("📜 HISTORY:", conversation_history)
-        print("============================\n")
+        # 3) LLM 호출
+        await generate_llm_reply(db, room_id, chatroom, uid, user_message_for_llm, manager)
 
-        current_foods = get_latest_recommended_foods(db, room_id)
+    except Exception as e:
+        logger.exception(f"채팅 턴 처리 오류 (room {room_id}): {e}")
+        await run_blocking(db.rollback)
+        if not is_location_message:
+            await retract_unsaved_message(room_id, chat_message, user_message_id, manager)
+        await broadcast_turn_error(room_id, manager)
 
-        try:
-            # 오행 정보 로딩
-            lacking_oheng, strong_oheng_db, oheng_type, oheng_scores = (
-                await _get_oheng_analysis_data(uid, db)
-            )
-            (
-                headline,
-                advice,
-                recommended_ohengs_weights,
-                control_ohengs,
-                strong_ohengs,
-            ) = define_oheng_messages(
-                lacking_oheng,
-                strong_oheng_db,
-                oheng_type,
-                oheng_scores
-            )
 
-            oheng_info_text = f"""
-            부족한 오행: {", ".join(lacking_oheng)}
-            강한 오행: {", ".join(strong_ohengs)}
-            조절 오행: {", ".join(control_ohengs)}
-            """
+# 모인 그룹방 멘션들을 LLM 호출 한 번으로 답변 (방 큐에서 실행)
+# 사용자 메시지는 멘션을 받을 때 이미 커밋돼 있으므로 자체 세션에서 봇 답변만 저장
+async def process_coalesced_mentions(
+    room_id: int,
+    mentions: List[dict],
+    manager: ConnectionManager,
+):
+    if len(mentions) == 1:
+        user_message_for_llm = mentions[0]["content"]
+    else:
+        # 누가 물어봤는지 알 수 있게 "닉네임: 내용" 한 줄씩
+        user_message_for_llm = "\n".join(
+            f"{mention['nickname'] or '사용자'}: {mention['content']}" for mention in mentions
+        )
 
-            llm_output = generate_llm_response(
-                conversation_history,
-                user_message_for_llm,
-                current_recommended_foods=current_foods,
-                oheng_info_text=oheng_info_text,
-            )
+    db = SessionLocal()
+    try:
+        chatroom = await run_blocking(db.get, ChatRoom, room_id)
+        if not chatroom:
+            return
 
-            print("🤖 LLM OUTPUT:", llm_output)
+        # 오행 정보는 가장 최근에 물어본 사람 기준
+        await generate_llm_reply(
+            db, room_id, chatroom, mentions[-1]["uid"], user_message_for_llm, manager
+        )
 
-        except Exception as llm_error:
-            print("💥 LLM 호출 오류:", llm_error)
-            await manager.broadcast(
-                room_id,
-                json.dumps(
-                    {
-                        "type": "new_message",
-                        "message": {
-                            "role": "assistant",
-                            "sender_name": "밥풀이",
-                            "content": "잠깐 오류났어 😅 다시 한번 말해줄래?",
-                            "message_type": "text",
-                        },
-                    }
-                ),
-            )
-            return
+    except Exception as e:
+        logger.exception(f"채팅 턴 처리 오류 (room {room_id}): {e}")
+        await run_blocking(db.rollback)
+        await broadcast_turn_error(room_id, manager)
+    finally:
+        await run_blocking(db.close)
 
-        # 4) LLM 응답에 MENU_SELECTED 태그가 있는 경우 → 위치 선택 단계로
-        location_select_reply = process_menu_selection(db, chatroom, llm_output)
-        if location_select_reply:
-            assistant_message = (
-                db.query(ChatMessage)
-                .filter(ChatMessage.id == chatroom.last_message_id)
-                .first()
-            )
-            if assistant_message:
-                bot_msg_json = chat_message_to_json(
-                    assistant_message, "밥풀이", uid
-                )
-                await manager.broadcast(
-                    room_id,
-                    json.dumps(
-                        {"type": "new_message", "message": bot_msg_json}
-                    ),
-                )
-            return
 
-        # 5) 일반 텍스트 응답
-        assistant_message = ChatMessage(
+# -------------------------------
+# WebSocket 엔드포인트
+# -------------------------------
+
+# 메시지 하나를 처리하는 동안만 DB 세션(커넥션)을 잡고 바로 반납
+# 소켓이 열려 있는 동안 세션을 유지하지 않으므로 커넥션 사용량은 처리 중인 턴 수에 비례
+async def process_websocket_message(
+    room_id: int,
+    uid: str,
+    user: User,
+    message_content: str,
+    manager: ConnectionManager,
+    mention_debouncer: MentionDebouncer = None,
+):
+    db = SessionLocal()
+    try:
+        await handle_websocket_message(
             room_id=room_id,
-            sender_id="assistant",
-            role="assistant",
-            content=llm_output,
-            message_type="text",
-            timestamp=datetime.datetime.utcnow(),
+            uid=uid,
+            user=user,
+            message_content=message_content,
+            db=db,
+            manager=manager,
+            mention_debouncer=mention_debouncer,
         )
-        db.add(assistant_message)
-        db.commit()
-        db.refresh(assistant_message)
+    finally:
+        await run_blocking(db.close)
 
-        bot_msg_json = chat_message_to_json(
-            assistant_message, "밥풀이", uid
-        )
-        await manager.broadcast(
-            room_id,
-            json.dumps({"type": "new_message", "message": bot_msg_json}),
+
+def get_room_member_user(db: Session, room_id: int, uid: str) -> tuple:
+    """
+    (user, is_member) 조회. 멤버 확인은 Redis 멤버 캐시(SISMEMBER)로 처리하고,
+    사용자 정보는 프로필 캐시를 우선 사용
+    """
+    if not ChatMembershipCacheService().is_member(room_id, uid, db):
+        return None, False
+
+    cache_service = UserCacheService()
+    profile = cache_service.get_user_profile(uid)
+    if profile and profile.get("id"):
+        user = User(
+            id=profile["id"],
+            firebase_uid=uid,
+            nickname=profile.get("nickname"),
+            profile_image=profile.get("profileImage"),
         )
+        return user, True
 
-        chatroom.last_message_id = assistant_message.id
-        db.add(chatroom)
-        db.commit()
+    user = db.query(User).filter(User.firebase_uid == uid).first()
+    if user:
+        cache_service.set_user_profile(uid, user)
+    return user, user is not None
+
+
+# WebSocket 연결 시 권한 확인 (확인하는 동안만 세션 사용)
+def authorize_websocket_user(room_id: int, uid: str) -> tuple:
+    with session_scope() as db:
+        return get_room_member_user(db, room_id, uid)
+
+
+# 재접속 시 스트림에서 받은 놓친 메시지를 new_message와 같은 형식으로 변환
+# hidden_initial / LOCATION_SELECTED 태그처럼 실시간으로도 보내지 않는 메시지는 제외
+def build_replay_messages(messages: List[dict], uid: str) -> List[dict]:
+    messages = [
+        m for m in messages
+        if m["message_type"] != "hidden_initial"
+        and not (m["role"] == "user" and (m["content"] or "").startswith("[LOCATION_SELECTED:"))
+    ]
+
+    # 보낸 사람 정보는 uid별로 한 번만 조회 (프로필 캐시 우선)
+    cache_service = UserCacheService()
+    senders: Dict[str, tuple] = {}
+    missing_uids = set()
+    for sender_id in {m["sender_id"] for m in messages if m["sender_id"] != "assistant"}:
+        profile = cache_service.get_user_profile(sender_id)
+        if profile:
+            senders[sender_id] = (profile.get("nickname"), profile.get("profileImage"))
+        else:
+            missing_uids.add(sender_id)
 
-    except Exception as e:
-        print("🔥 전체 처리 오류:", e)
-        await manager.broadcast(
-            room_id,
-            json.dumps(
+    with session_scope() as db:
+        if missing_uids:
+            for user in db.query(User).filter(User.firebase_uid.in_(missing_uids)).all():
+                senders[user.firebase_uid] = (user.nickname, user.profile_image)
+
+        result = []
+        for m in messages:
+            if m["sender_id"] == "assistant":
+                sender_name, sender_profile_url = "밥풀이", None
+            else:
+                nickname, sender_profile_url = senders.get(m["sender_id"], (None, None))
+                sender_name = nickname or "알 수 없음"
+
+            result.append(
                 {
-                    "type": "error",
-                    "message": "서버에서 오류가 발생했어 😭 다시 시도해줘!",
+                    "id": m["id"],
+                    "room_id": m["room_id"],
+                    "sender_id": m["sender_id"],
+                    "sender_name": sender_name,
+                    "sender_profile_url": sender_profile_url,
+                    "role": m["role"],
+                    "content": m["content"],
+                    "message_type": m["message_type"],
+                    "timestamp": m["timestamp"],
+                    "is_me": m["sender_id"] == uid,
                 }
-            ),
+            )
+
+        # 참조로 저장된 카드 메시지를 한 번에 채움
+        RestaurantCardService().hydrate_messages(result, db)
+    return result
+
+
+async def replay_missed_messages(
+    room_id: int,
+    uid: str,
+    websocket: WebSocket,
+    manager: ConnectionManager,
+    last_message_id: int,
+):
+    """
+    클라이언트가 마지막으로 받은 메시지 id 이후의 메시지만 다시 보냄
+    - 놓친 메시지는 replay 프레임 하나로 묶어서 전송 (전송 큐를 넘치지 않게)
+    - 스트림에서 찾을 수 없을 만큼 오래됐거나 너무 많으면 replay_truncated → 전체 다시 불러오기
+    연결 후에 조회하므로 실시간 new_message와 겹칠 수 있음 (클라이언트는 id로 중복 제거)
+    """
+    missed, truncated = await run_blocking(
+        get_stream_service().read_since, room_id, last_message_id
+    )
+    if truncated:
+        metrics.incr("chat.replay.truncated")
+        await manager.send_personal(
+            room_id,
+            websocket,
+            {"type": "replay_truncated", "last_message_id": last_message_id},
         )
+        return
 
+    messages = await run_blocking(build_replay_messages, missed, uid) if missed else []
+    metrics.incr("chat.replay.requests")
+    metrics.observe("chat.replay.messages", len(messages))
+    await manager.send_personal(
+        room_id,
+        websocket,
+        {"type": "replay", "last_message_id": last_message_id, "messages": messages},
+    )
 
-# -------------------------------
-# WebSocket 엔드포인트
-# -------------------------------
 
 @router.websocket("/ws/{room_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     room_id: int,
     token: str,
-    db: Session = Depends(get_db),
+    encoding: str = "json",
+    last_message_id: Optional[int] = None,
     manager: ConnectionManager = Depends(get_connection_manager),
+    room_queue: RoomWorkQueue = Depends(get_room_queue),
+    mention_debouncer: MentionDebouncer = Depends(get_mention_debouncer),
 ):
     try:
         uid = await get_user_uid_from_websocket_token(token)
 
-        user = db.query(User).filter(User.firebase_uid == uid).first()
-        if not user:
-            await websocket.close(code=1008, reason="등록되지 않은 사용자")
-            return
-
-        member = (
-            db.query(ChatroomMember)
-            .filter(
-                ChatroomMember.chatroom_id == room_id,
-                ChatroomMember.user_id == user.id,
-            )
-            .first()
-        )
-        if not member:
+        user, is_member = await run_blocking(authorize_websocket_user, room_id, uid)
+        if not is_member:
             await websocket.close(code=1008, reason="채팅방 접근 권한 없음")
             return
 
-        await manager.connect(room_id, uid, websocket)
+        # 서버 → 클라이언트 프레임 인코딩 (?encoding=msgpack 이면 바이너리 프레임)
+        # 클라이언트 → 서버 프레임은 JSON 텍스트
+        if not await manager.connect(room_id, uid, websocket, negotiate_encoding(encoding)):
+            return
 
         try:
+            # 재접속: ?last_message_id= 로 마지막으로 받은 메시지 id를 주면 그 뒤 메시지만 다시 보냄
+            # (실패해도 아래 finally에서 연결 정리)
+            if last_message_id is not None:
+                await replay_missed_messages(room_id, uid, websocket, manager, last_message_id)
+
             while True:
                 data = await websocket.receive_text()
+                # 어떤 프레임이든 받으면 살아있는 연결 (heartbeat pong 포함)
+                manager.touch(room_id, websocket)
                 message_data = json.loads(data)
 
-                if message_data.get("type") == "message":
-                    await handle_websocket_message(
-                        room_id=room_id,
-                        uid=uid,
-                        user=user,
-                        message_content=message_data.get("content"),
-                        db=db,
-                        manager=manager,
-                    )
+                if message_data.get("type") == "resume":
+                    # 연결을 유지한 채 놓친 메시지 요청 (앱이 백그라운드에서 돌아온 경우 등)
+                    resume_from = message_data.get("last_message_id")
+                    if resume_from is None:
+                        continue
+                    try:
+                        resume_from = int(resume_from)
+                    except (TypeError, ValueError):
+                        # 잘못된 값은 연결을 끊지 않고 오류 프레임으로 응답
+                        await manager.send_personal(
+                            room_id,
+                            websocket,
+                            {"type": "error", "message": "last_message_id가 올바르지 않습니다."},
+                        )
+                        continue
+                    await replay_missed_messages(room_id, uid, websocket, manager, resume_from)
+
+                elif message_data.get("type") == "read":
+                    # 읽음 확인: 이 방의 안 읽은 수 초기화
+                    await run_blocking(get_unread_service().mark_read, uid, room_id)
+
+                elif message_data.get("type") == "message":
+                    # 턴 처리는 방 큐에 넘기고 바로 다음 프레임을 받음
+                    # (같은 방은 순서대로, 다른 방은 병렬로 처리)
+                    message_content = message_data.get("content")
+                    if CHAT_TURN_MODE == "worker":
+                        # 턴 전체를 worker 프로세스에 맡기고, 답변은 방 채널 publish로 받음
+                        accepted = await get_turn_queue_service().enqueue(
+                            room_id, uid, user, message_content
+                        )
+                    else:
+                        accepted = room_queue.submit(
+                            room_id,
+                            lambda content=message_content: process_websocket_message(
+                                room_id=room_id,
+                                uid=uid,
+                                user=user,
+                                message_content=content,
+                                manager=manager,
+                                mention_debouncer=mention_debouncer,
+                            ),
+                        )
+                    if not accepted:
+                        await manager.send_personal(
+                            room_id,
+                            websocket,
+                            {
+                                "type": "error",
+                                "message": "요청이 너무 많아 😵 잠시 후 다시 보내줘!",
+                            },
+                        )
 
         except WebSocketDisconnect:
-            manager.disconnect(room_id, websocket)
             logger.info(
                 f"WebSocket disconnected: Room {room_id}, User {uid}"
             )
+        finally:
+            # 오류로 루프를 빠져나온 경우에도 연결 목록 / 연결 수 정리
+            manager.disconnect(room_id, websocket)
 
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
@@ -679,9 +1103,39 @@ async def websocket_endpoint(
 # 채팅방 생성
 # -------------------------------
 
+# 오늘의 오행 조언(hidden_initial)을 계산해 채팅방에 저장
+# 채팅방 생성 응답 이후 백그라운드에서 실행되므로 자체 세션 사용
+async def save_initial_advice_message(room_id: int, uid: str):
+    db = SessionLocal()
+    try:
+        detailed_message_content = await get_initial_chat_message(uid, db)
+        UserCacheService().set_user_daily_advice(
+            uid, datetime.date.today(), detailed_message_content
+        )
+
+        db.add(new_hidden_initial_message(room_id, detailed_message_content))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"초기 조언 메시지 저장 실패 (room {room_id}): {e}")
+    finally:
+        db.close()
+
+
+def new_hidden_initial_message(room_id: int, content: str) -> ChatMessage:
+    return ChatMessage(
+        room_id=room_id,
+        role="assistant",
+        content=content,
+        sender_id="assistant",
+        message_type="hidden_initial",
+    )
+
+
 @router.post("/create")
 async def create_chatroom(
     data: ChatRoomCreateRequest,
+    background_tasks: BackgroundTasks,
     uid: str = Depends(verify_firebase_token),
     db: Session = Depends(get_db),
 ):
@@ -715,23 +1169,23 @@ async def create_chatroom(
         else:
             final_room_name = ", ".join(nicknames)
 
+    # 채팅방, 멤버, 인사 메시지를 한 트랜잭션으로 저장 (flush로 id만 받고 commit 한 번)
     chatroom = ChatRoom(name=final_room_name, is_group=data.is_group)
     db.add(chatroom)
-    db.commit()
-    db.refresh(chatroom)
-
-    for member_user in members_to_add:
-        role = "owner" if member_user.id == user.id else "member"
-        member = ChatroomMember(
-            user_id=member_user.id,
-            chatroom_id=chatroom.id,
-            role=role,
-            joined_at=datetime.datetime.utcnow(),
-        )
-        db.add(member)
+    db.flush()
 
-    last_message_id = None
-    initial_message_content = None
+    joined_at = datetime.datetime.utcnow()
+    db.add_all(
+        [
+            ChatroomMember(
+                user_id=member_user.id,
+                chatroom_id=chatroom.id,
+                role="owner" if member_user.id == user.id else "member",
+                joined_at=joined_at,
+            )
+            for member_user in members_to_add
+        ]
+    )
 
     greeting_message_content = (
         "안녕! 나는 오늘의 운세에 맞춰 행운의 맛집을 추천해주는 '밥풀이'야🍀 "
@@ -744,27 +1198,25 @@ async def create_chatroom(
         sender_id="assistant",
     )
     db.add(greeting_message)
-    db.commit()
-        
-        
-    detailed_message_content = await get_initial_chat_message(uid, db)
-    detailed_message = ChatMessage(
-        room_id=chatroom.id,
-        role="assistant",
-        content=detailed_message_content,
-        sender_id="assistant",
-        message_type="hidden_initial",
-    )
-    db.add(detailed_message)
+
+    # 오늘의 조언이 캐시에 있으면 같이 저장, 없으면 응답 후 백그라운드에서 계산
+    cached_advice = UserCacheService().get_user_daily_advice(uid, datetime.date.today())
+    if cached_advice:
+        db.add(new_hidden_initial_message(chatroom.id, cached_advice))
+
+    db.flush()
+    chatroom.last_message_id = greeting_message.id
     db.commit()
 
+    if not cached_advice:
+        background_tasks.add_task(save_initial_advice_message, chatroom.id, uid)
 
-    last_message_id = greeting_message.id
-    initial_message_content = greeting_message_content
+    # 멤버 커밋 후 권한 캐시 채움
+    ChatMembershipCacheService().set_members(
+        chatroom.id, [member_user.firebase_uid for member_user in members_to_add]
+    )
 
-    chatroom.last_message_id = last_message_id
-    db.add(chatroom)
-    db.commit()
+    initial_message_content = greeting_message_content
 
     room_id_str = str(chatroom.id)
     Chat_rooms[room_id_str] = []
@@ -805,6 +1257,9 @@ async def list_chatrooms(
 
     rooms = query.options(joinedload(ChatRoom.latest_message)).all()
 
+    # 모든 방의 안 읽은 수를 HGETALL 한 번으로
+    unread_counts = get_unread_service().get_counts(uid)
+
     result = []
     for room in rooms:
         latest_msg = room.latest_message
@@ -860,6 +1315,7 @@ async def list_chatrooms(
                 "last_message_timestamp": kst_timestamp,
                 "member_count": member_count,
                 "member_profiles": member_profiles,
+                "unread_count": unread_counts.get(room.id, 0),
             }
         )
 
@@ -876,27 +1332,17 @@ async def get_messages(
     uid: str = Depends(verify_firebase_token),
     db: Session = Depends(get_db),
 ):
-    user = db.query(User).filter(User.firebase_uid == uid).first()
-    if not user:
-        raise HTTPException(
-            status_code=404, detail="사용자 인증 실패"
-        )
-
-    member = (
-        db.query(ChatroomMember)
-        .filter(
-            ChatroomMember.chatroom_id == room_id,
-            ChatroomMember.user_id == user.id,
-        )
-        .first()
-    )
-    if not member:
+    if not ChatMembershipCacheService().is_member(room_id, uid, db):
         raise HTTPException(
             status_code=403, detail="이 채팅방에 접근할 권한이 없습니다."
         )
 
     chatroom = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
 
+    # 아카이브된 방이면 메시지를 먼저 핫 테이블로 복원
+    if chatroom and chatroom.archived_at:
+        await run_blocking(ChatArchiveService().restore_room, db, chatroom)
+
     messages = (
         db.query(ChatMessage)
         .filter(ChatMessage.room_id == room_id)
@@ -937,6 +1383,9 @@ async def get_messages(
             }
         )
 
+    # 참조로 저장된 카드 메시지를 한 번에 채움
+    RestaurantCardService().hydrate_messages(result, db)
+
     return {
         "messages": result,
         "is_group": chatroom.is_group if chatroom else False,
@@ -947,48 +1396,165 @@ async def get_messages(
 
 
 # -------------------------------
-# 채팅방 삭제
+# 채팅방 대화 내보내기 (NDJSON 스트리밍)
 # -------------------------------
 
-@router.delete("/{room_id}")
-async def delete_chatroom(
+# 메시지를 CHAT_EXPORT_CHUNK_SIZE개씩 서버 측 커서(yield_per)로 읽어 한 줄씩 내보냄
+# - 요청 세션은 응답 시작 전에 반납되므로 생성기 안에서 자체 세션 사용
+# - 서버 측 커서가 열린 연결에서는 다른 쿼리를 실행할 수 없어 보낸 사람 / 카드 조회용 세션을 따로 사용
+# - 보낸 사람 정보는 chunk마다 처음 보는 uid만 한 번에 조회
+def iter_chatroom_export(room_id: int):
+    stream_db = SessionLocal()
+    lookup_db = SessionLocal()
+    card_service = RestaurantCardService()
+    senders: Dict[str, tuple] = {"assistant": ("밥풀이", None)}
+    exported = 0
+    try:
+        rows = iter(
+            stream_db.query(
+                ChatMessage.id,
+                ChatMessage.sender_id,
+                ChatMessage.role,
+                ChatMessage.content,
+                ChatMessage.message_type,
+                ChatMessage.timestamp,
+            )
+            .filter(ChatMessage.room_id == room_id)
+            .order_by(ChatMessage.id)
+            .yield_per(CHAT_EXPORT_CHUNK_SIZE)
+        )
+
+        while True:
+            chunk = list(islice(rows, CHAT_EXPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            new_uids = {row.sender_id for row in chunk} - senders.keys()
+            if new_uids:
+                users = lookup_db.query(User).filter(User.firebase_uid.in_(new_uids)).all()
+                for user in users:
+                    senders[user.firebase_uid] = (user.nickname, user.profile_image)
+                for sender_id in new_uids - {user.firebase_uid for user in users}:
+                    senders[sender_id] = (None, None)
+
+            messages = []
+            for row in chunk:
+                nickname, sender_profile_url = senders[row.sender_id]
+                messages.append(
+                    {
+                        "id": row.id,
+                        "room_id": room_id,
+                        "sender_id": row.sender_id,
+                        "sender_name": nickname or "알 수 없음",
+                        "sender_profile_url": sender_profile_url,
+                        "role": row.role,
+                        "content": row.content,
+                        "message_type": row.message_type,
+                        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                    }
+                )
+
+            # 참조로 저장된 카드 메시지는 chunk 단위로 한 번에 채움
+            card_service.hydrate_messages(messages, lookup_db)
+            # chunk 동안 읽은 식당 / 사용자 객체가 세션에 쌓이지 않게 비움
+            lookup_db.expunge_all()
+
+            exported += len(messages)
+            yield "".join(json.dumps(m, ensure_ascii=False) + "\n" for m in messages)
+    finally:
+        metrics.incr("chat.export.messages", exported)
+        stream_db.close()
+        lookup_db.close()
+
+
+@router.get("/export/{room_id}")
+async def export_chatroom(
     room_id: int,
     uid: str = Depends(verify_firebase_token),
     db: Session = Depends(get_db),
 ):
-    user = db.query(User).filter(User.firebase_uid == uid).first()
-    if not user:
+    if not ChatMembershipCacheService().is_member(room_id, uid, db):
+        raise HTTPException(
+            status_code=403, detail="이 채팅방에 접근할 권한이 없습니다."
+        )
+
+    chatroom = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+    if not chatroom:
+        raise HTTPException(status_code=404, detail="채팅방을 찾을 수 없음")
+
+    # 아카이브된 방이면 메시지를 먼저 핫 테이블로 복원
+    if chatroom.archived_at:
+        await run_blocking(ChatArchiveService().restore_room, db, chatroom)
+
+    # 동기 생성기는 Starlette가 스레드풀에서 돌리므로 이벤트 루프를 막지 않음
+    return StreamingResponse(
+        iter_chatroom_export(room_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="chatroom-{room_id}.ndjson"'},
+    )
+
+
+# -------------------------------
+# 읽음 확인 (안 읽은 메시지 수 초기화)
+# -------------------------------
+
+@router.post("/read/{room_id}")
+async def mark_chatroom_read(
+    room_id: int,
+    uid: str = Depends(verify_firebase_token),
+    db: Session = Depends(get_db),
+):
+    if not ChatMembershipCacheService().is_member(room_id, uid, db):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="등록되지 않은 사용자입니다.",
+            status_code=403, detail="이 채팅방에 접근할 권한이 없습니다."
         )
 
+    get_unread_service().mark_read(uid, room_id)
+    return {"message": "읽음 처리 완료", "room_id": room_id, "unread_count": 0}
+
+
+# -------------------------------
+# 채팅방 삭제
+# -------------------------------
+
+@router.delete("/{room_id}")
+async def delete_chatroom(
+    room_id: int,
+    uid: str = Depends(verify_firebase_token),
+    db: Session = Depends(get_db),
+):
     room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
     if not room:
         return {
             "message": "채팅방을 찾을 수 없습니다. 이미 삭제되었을 수 있습니다."
         }
 
-    member = (
-        db.query(ChatroomMember)
-        .filter(
-            ChatroomMember.chatroom_id == room_id,
-            ChatroomMember.user_id == user.id,
-        )
-        .first()
-    )
-    if not member:
+    membership_cache = ChatMembershipCacheService()
+    if not membership_cache.is_member(room_id, uid, db):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="이 채팅방을 삭제할 권한이 없습니다.",
         )
 
+    was_archived = room.archived_at is not None
+    member_uids = membership_cache.get_members(room_id, db)
     try:
+        # 파티션 테이블은 FK(ON DELETE CASCADE)를 쓸 수 없으므로 메시지를 직접 삭제
+        db.query(ChatMessage).filter(ChatMessage.room_id == room_id).delete(
+            synchronize_session=False
+        )
         db.delete(room)
         db.commit()
+        get_history_cache_service().invalidate(room_id)
+        get_stream_service().invalidate(room_id)
+        membership_cache.invalidate(room_id)
+        get_unread_service().clear_room(room_id, member_uids)
+        get_chat_state_service().invalidate(room_id)
+        if was_archived:
+            ChatArchiveService().delete_archive(room_id)
     except Exception as e:
         db.rollback()
-        print(f"채팅방 삭제 중 오류 발생: {e}")
+        logger.exception(f"채팅방 삭제 중 오류 발생 (room {room_id}): {e}")
 
     return {"message": "채팅방 삭제 완료"}
 
@@ -997,13 +1563,16 @@ async def delete_chatroom(
 # HTTP POST 메시지 전송 (/send)
 # -------------------------------
 
-@router.post("/send")
-async def send_message(
+async def process_send_message(
     request: MessageRequest,
-    uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db),
-    manager: ConnectionManager = Depends(get_connection_manager),
+    uid: str,
+    db: Session,
+    manager: ConnectionManager,
+    progress: Optional[Dict[str, Any]] = None,
 ):
+    """
+    progress: 응답 전에 실패해도 사용자 메시지가 커밋됐으면 progress["user_message_id"]에 기록
+    """
     user = db.query(User).filter(User.firebase_uid == uid).first()
     if not user:
         raise HTTPException(
@@ -1020,6 +1589,10 @@ async def send_message(
             status_code=404, detail="채팅방을 찾을 수 없음"
         )
 
+    # 아카이브된 방이면 LLM 대화 기록이 이어지도록 메시지를 먼저 핫 테이블로 복원
+    if chatroom.archived_at:
+        await run_blocking(ChatArchiveService().restore_room, db, chatroom)
+
     chat_message = ChatMessage(
         room_id=chatroom.id,
         sender_id=uid,
@@ -1028,26 +1601,28 @@ async def send_message(
         timestamp=datetime.datetime.utcnow(),
     )
     db.add(chat_message)
-    db.commit()
-    db.refresh(chat_message)
+    db.flush()
+    user_message_id = chat_message.id
 
     user_msg_json = chat_message_to_json(
         chat_message, user.nickname, uid
     )
     await manager.broadcast(
         chatroom.id,
-        json.dumps({"type": "new_message", "message": user_msg_json}),
+        {"type": "new_message", "message": user_msg_json},
     )
 
-    MENTION_TAG = "@밥풀이"
     is_llm_triggered = (not chatroom.is_group) or (
         chatroom.is_group and MENTION_TAG in request.message
     )
 
     if not is_llm_triggered:
         chatroom.last_message_id = chat_message.id
-        db.add(chatroom)
-        db.commit()
+        try:
+            commit_turn(db)
+        except Exception:
+            await retract_unsaved_message(request.room_id, chat_message, user_message_id, manager)
+            raise
         return {
             "message": "메시지 전송 완료 (LLM 미호출)",
             "user_message_id": chat_message.id,
@@ -1060,6 +1635,7 @@ async def send_message(
             db, chatroom, user_message_content, chat_message.id
         )
         if location_select_result:
+            commit_turn(db)
             return location_select_result
 
         # 2) 멘션 태그 제거
@@ -1069,49 +1645,42 @@ async def send_message(
                 MENTION_TAG, ""
             ).strip()
 
-        # 3) 기존 대화 내역 + 오행 + current_foods
-        conversation_history = build_conversation_history(
-            db, chatroom.id
-        )
-
-        print("\n============================")
-        print("📩 USER MESSAGE:", user_message_for_llm)
-        print("📜 HISTORY:", conversation_history)
-        print("============================\n")
-
-        current_foods = get_latest_recommended_foods(db, chatroom.id)
-
-        lacking_oheng, strong_oheng_db, oheng_type, oheng_scores = (
-            await _get_oheng_analysis_data(uid, db)
-        )
-        (
-            headline,
-            advice,
-            recommended_ohengs_weights,
-            control_ohengs,
-            strong_ohengs,
-        ) = define_oheng_messages(
-            lacking_oheng, strong_oheng_db, oheng_type, oheng_scores
-        )
+        # 3) 기존 대화 내역 + 오행 + current_foods (동시에 준비)
+        try:
+            conversation_history, current_foods, oheng_info_text = await build_turn_context(
+                db, chatroom.id, chatroom, uid
+            )
 
-        oheng_info_text = f"""
-        부족한 오행: {", ".join(lacking_oheng)}
-        강한 오행: {", ".join(strong_ohengs)}
-        조절 오행: {", ".join(control_ohengs)}
-        """
+            logger.debug(
+                f"LLM 호출 (room {chatroom.id}): message {len(user_message_for_llm)}자, "
+                f"history {len(conversation_history)}자"
+            )
 
-        llm_output = generate_llm_response(
-            conversation_history,
-            user_message_for_llm,
-            current_recommended_foods=current_foods,
-            oheng_info_text=oheng_info_text,
-        )
+            llm_output = await get_or_generate_llm_response(
+                lambda: generate_llm_response_async(
+                    conversation_history,
+                    user_message_for_llm,
+                    current_recommended_foods=current_foods,
+                    oheng_info_text=oheng_info_text,
+                ),
+                conversation_history,
+                user_message_for_llm,
+                current_recommended_foods=current_foods,
+                oheng_info_text=oheng_info_text,
+            )
+        except Exception:
+            # 응답 생성에 실패해도 이미 브로드캐스트한 사용자 메시지는 저장
+            commit_turn(db)
+            if progress is not None:
+                progress["user_message_id"] = chat_message.id
+            raise
 
         # 4) LLM 응답에 MENU_SELECTED → 위치 선택 메시지
         location_select_reply = process_menu_selection(
             db, chatroom, llm_output
         )
         if location_select_reply:
+            commit_turn(db)
             return {
                 "reply": location_select_reply,
                 "user_message_id": chat_message.id,
@@ -1121,21 +1690,8 @@ async def send_message(
         assistant_reply = llm_output
         message_type = "text"
 
-        assistant_message = ChatMessage(
-            room_id=chatroom.id,
-            sender_id="assistant",
-            role="assistant",
-            content=assistant_reply,
-            message_type=message_type,
-            timestamp=datetime.datetime.utcnow(),
-        )
-        db.add(assistant_message)
-        db.commit()
-        db.refresh(assistant_message)
-
-        chatroom.last_message_id = assistant_message.id
-        db.add(chatroom)
-        db.commit()
+        add_assistant_message(db, chatroom, assistant_reply, message_type)
+        commit_turn(db)
 
         return {
             "reply": {
@@ -1147,6 +1703,50 @@ async def send_message(
         }
 
     except Exception as e:
+        db.rollback()
+        await retract_unsaved_message(request.room_id, chat_message, user_message_id, manager)
         raise HTTPException(
             status_code=500, detail=f"LLM 처리 중 오류: {e}"
         )
+
+
+@router.post("/send")
+async def send_message(
+    request: MessageRequest,
+    uid: str = Depends(verify_firebase_token),
+    db: Session = Depends(get_db),
+    manager: ConnectionManager = Depends(get_connection_manager),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    if not idempotency_key:
+        return await process_send_message(request, uid, db, manager)
+
+    # 타임아웃 후 재시도로 같은 키가 다시 오면 LLM을 다시 부르지 않고 첫 응답을 돌려줌
+    idempotency = IdempotencyService("chat_send", pending_ttl=int(LLM_DEADLINE_SECONDS) + 30)
+    payload = request.model_dump()
+    replay = await idempotency.begin_async(uid, idempotency_key, payload)
+    if replay is not None:
+        return replay
+
+    progress: Dict[str, Any] = {}
+    try:
+        result = await process_send_message(request, uid, db, manager, progress)
+    except Exception as e:
+        if "user_message_id" in progress:
+            # 사용자 메시지는 이미 저장 / 브로드캐스트됨 → 같은 키로 재시도해도 다시 만들지 않도록 오류 응답을 저장
+            status_code = e.status_code if isinstance(e, HTTPException) else 500
+            detail = e.detail if isinstance(e, HTTPException) else "메시지 처리 중 오류가 발생했습니다."
+            await run_blocking(
+                idempotency.complete,
+                uid,
+                idempotency_key,
+                payload,
+                {"detail": detail, "user_message_id": progress["user_message_id"]},
+                status_code,
+            )
+        else:
+            await run_blocking(idempotency.release, uid, idempotency_key)
+        raise
+
+    await run_blocking(idempotency.complete, uid, idempotency_key, payload, result)
+    return result
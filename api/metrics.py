@@ -0,0 +1,22 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from core.config import METRICS_TOKEN
+from core.metrics import MetricsRegistry, get_metrics
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+# 지표에는 방 id 등 내부 정보가 있으므로 공유 토큰을 가진 모니터링에서만 조회
+# 토큰이 설정되지 않았으면 엔드포인트 자체를 숨김
+def verify_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_metrics_token or not hmac.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="유효하지 않은 지표 토큰입니다.")
+
+
+# 현재 프로세스의 지표 조회
+@router.get("", dependencies=[Depends(verify_metrics_token)])
+def read_metrics(registry: MetricsRegistry = Depends(get_metrics)):
+    return registry.snapshot()
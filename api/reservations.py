@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Body
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime, date, time
 from core.firebase_auth import verify_firebase_token
 from core.db import get_db
 from core.models import Reservation, Restaurant, User 
+from services.idempotency_service import IdempotencyService
 
 router = APIRouter(prefix="/reservations", tags=["reservations"])
 
@@ -42,8 +43,29 @@ class ReservationDisplay(BaseModel):
 def create_reservation(
     reservation: ReservationCreate,
     db: Session = Depends(get_db),
-    uid: str = Depends(verify_firebase_token)
+    uid: str = Depends(verify_firebase_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    if not idempotency_key:
+        return insert_reservation(reservation, db, uid)
+
+    # 타임아웃 후 재시도로 같은 키가 다시 오면 예약을 새로 만들지 않고 첫 응답을 돌려줌
+    idempotency = IdempotencyService("reservation_create")
+    replay = idempotency.begin(uid, idempotency_key, reservation.model_dump())
+    if replay is not None:
+        return replay
+
+    try:
+        result = insert_reservation(reservation, db, uid)
+    except Exception:
+        idempotency.release(uid, idempotency_key)
+        raise
+
+    idempotency.complete(uid, idempotency_key, reservation.model_dump(), result)
+    return result
+
+
+def insert_reservation(reservation: ReservationCreate, db: Session, uid: str) -> ReservationDisplay:
     user = db.query(User).filter(User.firebase_uid == uid).first()
     if not user:
         raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다.")
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 
 from core.firebase_auth import verify_firebase_token
 from core.db import get_db
+from core.executor import run_blocking
 from core.models import User
 
 from typing import Dict, Tuple, List
@@ -34,7 +35,10 @@ def get_user_oheng_scores(db: Session, user_id: str) -> Dict[str, float]:
     
 # 오행 분석 결과 추출
 async def _get_oheng_analysis_data(uid: str, db: Session) -> Tuple[List[str], List[str], str, Dict[str, float]]:
-    user = db.query(User).filter(User.firebase_uid == uid).first()
+    # 채팅 턴에서도 호출되므로 DB 조회는 스레드풀에서 (이벤트 루프를 막지 않음)
+    user = await run_blocking(
+        lambda: db.query(User).filter(User.firebase_uid == uid).first()
+    )
     
     if not user:
         raise HTTPException(status_code=404, detail="등록된 사용자를 찾을 수 없습니다.")
@@ -0,0 +1,114 @@
+import json
+import sys
+import os
+import time
+import zlib
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ws_frames import ENCODING_JSON, ENCODING_MSGPACK, encode_frame
+
+# WebSocket 프레임 인코딩 벤치마크: 메시지당 바이트 수 / 직렬화 시간
+#   python benchmarks/ws_frame_encoding.py [반복 횟수]
+#
+# - legacy: 기존 방식 (json.dumps 기본값 → 한글이 \uXXXX로 escape, 카드 JSON이 문자열로 한 번 더 escape)
+# - json: ensure_ascii=False 텍스트 프레임
+# - msgpack: 카드 구조화 + epoch ms 시각 + 빈 필드 생략 바이너리 프레임
+# deflate 열은 permessage-deflate 적용 시 크기 (raw deflate, 메시지 단위)
+
+
+def sample_restaurant(i: int) -> dict:
+    return {
+        "id": 1000 + i,
+        "name": f"행운의 짬뽕 {i}호점",
+        "category": "중식",
+        "address": f"서울 마포구 와우산로 {i * 7}길 12",
+        "image": f"https://bapick-images.s3.ap-northeast-2.amazonaws.com/restaurants/{1000 + i}.jpg",
+        "rating": 4.3,
+        "review_count": 120 + i,
+        "distance_km": 0.4 + i / 10,
+        "description": "불맛 가득한 해물 짬뽕과 바삭한 탕수육이 유명한 곳. 점심에는 웨이팅이 있지만 회전이 빨라.",
+        "ohaeng": ["火", "水"],
+    }
+
+
+def sample_frames() -> dict:
+    timestamp = datetime.datetime(2025, 5, 1, 12, 30, 15).isoformat()
+    card_content = json.dumps(
+        {"restaurants": [sample_restaurant(i) for i in range(5)], "count": 5},
+        ensure_ascii=False,
+    )
+    return {
+        "text": {
+            "type": "new_message",
+            "message": {
+                "id": 123456,
+                "room_id": 42,
+                "sender_id": "assistant",
+                "sender_name": "밥풀이",
+                "sender_profile_url": None,
+                "role": "assistant",
+                "content": "오늘은 부족한 水 기운을 채워줄 짬뽕, 물회, 냉모밀 어때? 하나 골라줘!",
+                "message_type": "text",
+                "timestamp": timestamp,
+                "is_me": False,
+            },
+        },
+        "restaurant_cards": {
+            "type": "new_message",
+            "message": {
+                "id": 123457,
+                "room_id": 42,
+                "sender_id": "assistant",
+                "sender_name": "밥풀이",
+                "sender_profile_url": None,
+                "role": "assistant",
+                "content": card_content,
+                "message_type": "restaurant_cards",
+                "timestamp": timestamp,
+                "is_me": False,
+            },
+        },
+        "assistant_delta": {
+            "type": "assistant_delta",
+            "stream_id": "9f1c2e7b3a4d4e0f8b6a5c4d3e2f1a0b",
+            "delta": "오늘은 부족한 水 기운을",
+        },
+    }
+
+
+def deflated_size(payload) -> int:
+    data = payload.encode("utf-8") if isinstance(payload, str) else payload
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+def measure(encode, frame, iterations: int):
+    payload = encode(frame)
+    size = len(payload.encode("utf-8")) if isinstance(payload, str) else len(payload)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode(frame)
+    elapsed_us = (time.perf_counter() - started) / iterations * 1_000_000
+    return size, deflated_size(payload), elapsed_us
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    encoders = {
+        "legacy": json.dumps,
+        "json": lambda frame: encode_frame(frame, ENCODING_JSON),
+        "msgpack": lambda frame: encode_frame(frame, ENCODING_MSGPACK),
+    }
+
+    print(f"{'frame':<18}{'encoding':<10}{'bytes':>8}{'deflate':>10}{'us/msg':>10}")
+    for frame_name, frame in sample_frames().items():
+        for encoding_name, encode in encoders.items():
+            size, deflated, elapsed_us = measure(encode, frame, iterations)
+            print(f"{frame_name:<18}{encoding_name:<10}{size:>8}{deflated:>10}{elapsed_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import time
+import asyncio
+import logging
+from core.config import (
+    CHAT_WORKER_CONCURRENCY,
+    CHAT_WORKER_PARTITIONS,
+    CHAT_WORKER_COUNT,
+    CHAT_WORKER_INDEX,
+    CHAT_WORKER_LEASE_SECONDS,
+)
+from core.models import User
+from core.executor import run_blocking
+from core.room_queue import RoomWorkQueue
+from core.websocket_manager import RedisConnectionManager
+from services.chat_turn_queue_service import ChatTurnQueueService
+from services.idempotency_service import IdempotencyService
+from api.chat import process_websocket_message
+from vectordb.vectordb_util import get_embeddings, get_chroma_client
+
+# 채팅 턴 worker (CHAT_TURN_MODE=worker 일 때 사용)
+#
+# 사용법
+#   CHAT_WORKER_COUNT=2 CHAT_WORKER_INDEX=0 python chat_worker.py
+#   CHAT_WORKER_COUNT=2 CHAT_WORKER_INDEX=1 python chat_worker.py
+#
+# - 웹 프로세스가 파티션 스트림(chat:turn_jobs:{room_id % 파티션 수})에 넣은 턴 작업을 처리
+# - 파티션 p는 p % CHAT_WORKER_COUNT == CHAT_WORKER_INDEX 인 worker 하나만 읽음
+#   → 같은 방의 턴은 한 worker 안의 방 큐에서 들어온 순서대로 처리 (worker 간 락 경쟁 없음)
+# - 같은 번호의 worker가 둘 뜨지 않도록 번호를 점유(lease)하고, 점유를 잃으면 종료
+#   (죽은 worker의 파티션은 점유가 만료된 뒤 재시작한 같은 번호의 worker가 이어서 처리)
+# - 사용자 메시지 저장 / LLM 호출 / 답변 저장까지 웹 프로세스의 inline 처리와 같은 코드(process_websocket_message) 사용
+# - 프레임은 방 채널(chat:room:{id})에 publish → 소켓을 가진 웹 프로세스가 전달 (웹 쪽은 WS_BACKEND=redis 필요)
+# - 그룹방 멘션 debounce는 쓰지 않음: 작업마다 답변까지 끝낸 뒤 ACK해야 worker가 죽어도 답변이 유실되지 않음
+# - 처리가 끝난 작업은 항목 id로 기록해서, ACK 전에 멈춰 다시 전달되더라도 두 번 처리하지 않음
+
+logger = logging.getLogger(__name__)
+
+# 처리 완료 기록 유지 시간: 재시작한 worker가 이어받을 때까지 충분히 길게
+PROCESSED_TTL_SECONDS = 86400
+
+
+class ChatTurnWorker:
+
+    def __init__(
+        self,
+        worker_index: int = CHAT_WORKER_INDEX,
+        worker_count: int = CHAT_WORKER_COUNT,
+        concurrency: int = CHAT_WORKER_CONCURRENCY,
+    ):
+        self.worker_index = worker_index
+        self.concurrency = concurrency
+        self.partitions = [p for p in range(CHAT_WORKER_PARTITIONS) if p % worker_count == worker_index]
+        self.queue_service = ChatTurnQueueService()
+        self.consumer = ChatTurnQueueService.consumer_name(worker_index)
+        self.lease_token = ChatTurnQueueService.lease_token()
+        self.processed = IdempotencyService("chat_turn_job", response_ttl=PROCESSED_TTL_SECONDS)
+        # 이 프로세스에는 소켓이 없으므로 broadcast는 방 채널 publish만 함
+        self.manager = RedisConnectionManager()
+        # 처리 중인 작업은 slots로 concurrency개까지이므로 방 큐가 가득 차는 일은 없음
+        self.room_queue = RoomWorkQueue(max_pending=concurrency)
+        # 동시에 처리 중인(방 큐에 들어간) 작업 수 제한
+        self.slots = asyncio.Semaphore(concurrency)
+
+    async def run(self):
+        if not self.partitions:
+            logger.error(f"담당 파티션 없음: worker {self.worker_index} (파티션 {CHAT_WORKER_PARTITIONS}개)")
+            return
+
+        # 이전 프로세스의 점유가 만료될 때까지 대기
+        while not await self.queue_service.acquire_lease(self.worker_index, self.lease_token):
+            logger.info(f"worker {self.worker_index} 점유 대기 중")
+            await asyncio.sleep(CHAT_WORKER_LEASE_SECONDS / 3)
+
+        await self.queue_service.ensure_groups(self.partitions)
+        logger.info(
+            f"채팅 턴 worker 시작: {self.consumer} (파티션 {self.partitions}, 동시 처리 {self.concurrency})"
+        )
+
+        consume = asyncio.create_task(self._consume())
+        keep_lease = asyncio.create_task(self._keep_lease())
+        try:
+            # 점유를 잃으면 keep_lease가 끝나고, 읽기도 멈춤
+            await asyncio.wait({consume, keep_lease}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            consume.cancel()
+            keep_lease.cancel()
+            try:
+                await self.queue_service.release_lease(self.worker_index, self.lease_token)
+            except Exception as e:
+                logger.error(f"worker 점유 해제 실패: {e}")
+
+        if consume.done() and not consume.cancelled() and consume.exception():
+            raise consume.exception()
+        raise RuntimeError(f"worker {self.worker_index} 점유를 잃어 종료")
+
+    async def _consume(self):
+        # 이전 실행에서 ACK하지 못한 작업부터 스트림 순서대로
+        for stream, entry_id, job in await self.queue_service.read_pending(self.consumer, self.partitions):
+            await self.slots.acquire()
+            self._submit(stream, entry_id, job)
+
+        while True:
+            try:
+                jobs = await self.queue_service.read(self.consumer, self.partitions, self.concurrency)
+                for stream, entry_id, job in jobs:
+                    await self.slots.acquire()
+                    self._submit(stream, entry_id, job)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"턴 작업 읽기 실패: {e}")
+                await asyncio.sleep(1)
+
+    # 점유 시간을 주기적으로 연장, 점유를 잃거나 점유 시간 동안 연장하지 못하면 반환
+    async def _keep_lease(self):
+        last_renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(CHAT_WORKER_LEASE_SECONDS / 3)
+            try:
+                if not await self.queue_service.renew_lease(self.worker_index, self.lease_token):
+                    logger.error(f"worker {self.worker_index} 점유를 다른 프로세스가 가져감")
+                    return
+                last_renewed = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"worker 점유 연장 실패: {e}")
+                if time.monotonic() - last_renewed >= CHAT_WORKER_LEASE_SECONDS:
+                    return
+
+    def _submit(self, stream: str, entry_id: str, job: dict):
+        accepted = self.room_queue.submit(job["room_id"], lambda: self._run_job(stream, entry_id, job))
+        if not accepted:
+            # slots로 제한하므로 일어나지 않지만, ACK하지 않은 작업은 재시작 시 다시 처리됨
+            self.slots.release()
+
+    async def _run_job(self, stream: str, entry_id: str, job: dict):
+        processed_key = f"{stream}:{entry_id}"
+        try:
+            if await run_blocking(self.processed.is_completed, job["uid"], processed_key):
+                # 이전 전달에서 처리까지 끝났지만 ACK 전에 멈춘 작업
+                logger.info(f"이미 처리한 턴 작업 건너뜀: {processed_key}")
+            else:
+                user = User(
+                    id=job["user_id"],
+                    firebase_uid=job["uid"],
+                    nickname=job["nickname"],
+                    profile_image=job["profile_image"],
+                )
+                await process_websocket_message(
+                    room_id=job["room_id"],
+                    uid=job["uid"],
+                    user=user,
+                    message_content=job["content"],
+                    manager=self.manager,
+                )
+                await run_blocking(
+                    self.processed.complete, job["uid"], processed_key, job, {"entry_id": entry_id}
+                )
+            await self.queue_service.ack(stream, entry_id)
+        finally:
+            self.slots.release()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    # 식당 추천(위치 선택 턴)에 쓰는 임베딩 모델 / ChromaDB를 미리 로드
+    get_embeddings()
+    get_chroma_client()
+
+    asyncio.run(ChatTurnWorker().run())
+
+
+if __name__ == "__main__":
+    main()
@@ -19,4 +19,85 @@ AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
 AWS_S3_REGION = os.getenv("AWS_S3_REGION")
 
 CHROMA_HOST = os.getenv("CHROMA_HOST")
-CHROMA_PORT = int(os.getenv("CHROMA_PORT"))
\ No newline at end of file
+CHROMA_PORT = int(os.getenv("CHROMA_PORT"))
+
+# 채팅 LLM 응답 스트리밍 여부 (assistant_delta 프레임 브로드캐스트)
+CHAT_STREAMING_ENABLED = os.getenv("CHAT_STREAMING_ENABLED", "true").lower() == "true"
+
+# 채팅 턴의 블로킹 작업(LLM, 벡터 검색, DB)을 실행할 스레드 수
+CHAT_EXECUTOR_WORKERS = int(os.getenv("CHAT_EXECUTOR_WORKERS", 16))
+# 채팅방별 대기 가능한 최대 턴 수
+CHAT_ROOM_QUEUE_SIZE = int(os.getenv("CHAT_ROOM_QUEUE_SIZE", 20))
+
+# WebSocket 브로드캐스트 백엔드: memory(단일 프로세스, 개발용) | redis(프로세스 간 pub/sub)
+WS_BACKEND = os.getenv("WS_BACKEND", "memory").lower()
+
+# WebSocket 연결별 전송 대기 큐 크기 (가득 차면 느린 클라이언트로 보고 연결 종료)
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))
+
+# 동일한 LLM 요청 응답 캐시 유지 시간(초)
+LLM_RESPONSE_CACHE_TTL = int(os.getenv("LLM_RESPONSE_CACHE_TTL", 300))
+
+# Gemma(LLM) 호출 제어
+# 동시에 provider로 나갈 수 있는 최대 호출 수
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# 호출 1회 타임아웃(초)과 재시도 포함 전체 마감 시간(초)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 20))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", 45))
+# 일시적 오류(429, 5xx, 타임아웃) 재시도 횟수
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+# 연속 실패가 이 횟수에 도달하면 CIRCUIT_RESET_SECONDS 동안 바로 실패 처리
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", 5))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", 30))
+
+# 오래된 채팅방 메시지 아카이브 (gzip JSONL)
+# 저장소: 전용 비공개 S3 버킷(CHAT_ARCHIVE_S3_BUCKET) 또는 영구 볼륨에 마운트한 로컬 디렉터리(CHAT_ARCHIVE_DIR)
+# 공개 이미지용 버킷(AWS_S3_BUCKET_NAME)은 쓰지 않고, 둘 다 없으면 아카이브하지 않음 (MySQL에서 지우므로)
+CHAT_ARCHIVE_ENABLED = os.getenv("CHAT_ARCHIVE_ENABLED", "false").lower() == "true"
+CHAT_ARCHIVE_INACTIVE_DAYS = int(os.getenv("CHAT_ARCHIVE_INACTIVE_DAYS", 90))
+CHAT_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("CHAT_ARCHIVE_INTERVAL_SECONDS", 3600))
+CHAT_ARCHIVE_BATCH_SIZE = int(os.getenv("CHAT_ARCHIVE_BATCH_SIZE", 50))
+CHAT_ARCHIVE_S3_BUCKET = os.getenv("CHAT_ARCHIVE_S3_BUCKET")
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR")
+CHAT_ARCHIVE_S3_PREFIX = os.getenv("CHAT_ARCHIVE_S3_PREFIX", "chat-archive")
+
+# 끊긴 연결 감지는 uvicorn 프로토콜 ping/pong(--ws-ping-interval / --ws-ping-timeout, 브라우저가 자동 응답)으로 처리
+# 앱 수준 heartbeat: WS_PING_INTERVAL초마다 {"type": "ping"} 프레임 전송,
+# WS_IDLE_TIMEOUT초 동안 아무 프레임(pong 포함)도 받지 못한 연결은 종료
+# 클라이언트가 pong을 보내기 전에 켜면 읽기만 하는 연결이 모두 끊기므로 기본은 꺼둠
+WS_APP_HEARTBEAT_ENABLED = os.getenv("WS_APP_HEARTBEAT_ENABLED", "false").lower() == "true"
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", 20))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 60))
+# 프로세스당 / 사용자당 최대 WebSocket 연결 수
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", 5000))
+WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", 5))
+
+# 프롬프트에 넣을 대화 기록 최대 토큰 수 (추정치)
+LLM_HISTORY_TOKEN_BUDGET = int(os.getenv("LLM_HISTORY_TOKEN_BUDGET", 800))
+
+# 그룹방 챗봇 멘션 debounce 시간(초): 이 시간 동안 들어온 멘션을 LLM 호출 한 번으로 묶어 답변 (0이면 멘션마다 바로 답변)
+CHAT_MENTION_DEBOUNCE_SECONDS = float(os.getenv("CHAT_MENTION_DEBOUNCE_SECONDS", 1.5))
+
+# 채팅방별 메시지 스트림 길이(대략) / 재접속 시 다시 보내줄 최대 메시지 수 (넘으면 전체 다시 불러오기)
+CHAT_STREAM_MAXLEN = int(os.getenv("CHAT_STREAM_MAXLEN", 500))
+CHAT_REPLAY_MAX_MESSAGES = int(os.getenv("CHAT_REPLAY_MAX_MESSAGES", 100))
+
+# 채팅 턴 처리 방식: inline(웹 프로세스에서 바로 처리) | worker(Redis Stream 작업 큐 → chat_worker.py가 처리)
+# worker 모드는 답변을 방 채널로 publish하므로 WS_BACKEND=redis 필요
+CHAT_TURN_MODE = os.getenv("CHAT_TURN_MODE", "inline").lower()
+# worker 프로세스당 동시에 처리할 턴 수
+CHAT_WORKER_CONCURRENCY = int(os.getenv("CHAT_WORKER_CONCURRENCY", 16))
+# 턴 작업 스트림은 room_id % CHAT_WORKER_PARTITIONS 로 나누고, 파티션마다 worker 하나만 읽음 (방 안의 순서 보장)
+# 파티션 수를 바꾸면 방이 다른 스트림으로 옮겨지므로 큐를 비운 뒤 변경
+CHAT_WORKER_PARTITIONS = int(os.getenv("CHAT_WORKER_PARTITIONS", 16))
+# 전체 worker 수 / 이 worker의 번호(0부터): 파티션 p는 p % CHAT_WORKER_COUNT == CHAT_WORKER_INDEX 인 worker가 담당
+CHAT_WORKER_COUNT = int(os.getenv("CHAT_WORKER_COUNT", 1))
+CHAT_WORKER_INDEX = int(os.getenv("CHAT_WORKER_INDEX", 0))
+# 담당 파티션 점유 시간(초): 같은 번호의 worker가 둘 뜨지 않게 하고, 죽은 worker는 이 시간 뒤 재시작한 worker가 이어받음
+CHAT_WORKER_LEASE_SECONDS = int(os.getenv("CHAT_WORKER_LEASE_SECONDS", 60))
+
+# 채팅방 대화 내보내기(NDJSON)에서 한 번에 가져오는 메시지 수 (서버 측 커서 fetch 단위)
+CHAT_EXPORT_CHUNK_SIZE = int(os.getenv("CHAT_EXPORT_CHUNK_SIZE", 1000))
+
+# /api/metrics 조회용 공유 토큰 (X-Metrics-Token 헤더), 없으면 지표 엔드포인트 비활성화
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -17,4 +18,14 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 요청 범위 밖(WebSocket 루프, 백그라운드 작업)에서 쓰는 짧은 DB 세션
+# 작업 단위가 끝나면 바로 닫아 커넥션을 풀에 반납
+@contextmanager
+def session_scope():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
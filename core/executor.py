@@ -0,0 +1,18 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+from core.config import CHAT_EXECUTOR_WORKERS
+
+# 채팅 턴 전용 스레드풀
+# 동기 LLM 호출 / Chroma 검색 / ONNX 임베딩 / DB 커밋이 이벤트 루프를 막지 않도록 여기서 실행
+# 스레드 수를 제한해 provider가 느려져도 스레드가 무한정 늘어나지 않게 함
+_executor = ThreadPoolExecutor(
+    max_workers=CHAT_EXECUTOR_WORKERS,
+    thread_name_prefix="chat-turn",
+)
+
+# 블로킹 함수를 채팅 턴 스레드풀에서 실행하고 결과를 기다림
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
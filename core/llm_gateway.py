@@ -0,0 +1,401 @@
+import re
+import time
+import asyncio
+import random
+import threading
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from google.genai import types
+from core.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT_SECONDS,
+    LLM_DEADLINE_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_SECONDS,
+)
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 만한 HTTP 상태 코드 (할당량 초과 / 일시적 서버 오류)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# provider가 불안정해 호출하지 않고 바로 실패한 경우 (circuit open, 대기 시간 초과)
+class LLMUnavailableError(Exception):
+    pass
+
+
+# 에러에서 HTTP 상태 코드 추출 (google-genai APIError는 code 속성을 가짐)
+def _status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    if "429" in str(error) or "RESOURCE_EXHAUSTED" in str(error):
+        return 429
+    return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if _status_code(error) in RETRYABLE_STATUS_CODES:
+        return True
+    # httpx / 표준 라이브러리 타임아웃
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
+
+
+# 429 응답의 "Please retry in Xs" 안내에서 대기 시간(초) 추출
+def _retry_hint_seconds(error: Exception) -> Optional[float]:
+    match = re.search(r"retry in (\d+\.?\d*)s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# 슬롯을 기다리는 호출 하나 (스레드면 event, 이벤트 루프면 future로 깨움)
+class _SlotWaiter:
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.granted = False
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+
+# 동기(스레드) / 비동기(이벤트 루프) 호출이 함께 쓰는 동시성 슬롯
+# 먼저 기다린 호출부터 차례로 받고(FIFO), 반납된 슬롯은 대기 중인 호출에 바로 넘김 (폴링 없음)
+class _FairSlots:
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._available = limit
+        self._waiters: Deque[_SlotWaiter] = deque()
+
+    # 바로 받을 수 있으면 None, 아니면 대기열에 넣은 waiter
+    def _try_acquire(self, make_waiter) -> Optional[_SlotWaiter]:
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return None
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            return waiter
+
+    # 기다림이 끝난 waiter 정리: 슬롯을 넘겨받았으면 True, 아니면 대기열에서 빼고 False
+    def _settle(self, waiter: _SlotWaiter) -> bool:
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        waiter = self._try_acquire(lambda: _SlotWaiter(event=threading.Event()))
+        if waiter is None:
+            return True
+        waiter.event.wait(max(0.0, timeout))
+        return self._settle(waiter)
+
+    async def acquire_async(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        waiter = self._try_acquire(lambda: _SlotWaiter(loop=loop, future=loop.create_future()))
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(waiter.future, timeout=max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # 기다리다 취소됨: 그 사이 넘겨받은 슬롯이 있으면 다음 호출에 넘김
+            if self._settle(waiter):
+                self.release()
+            raise
+        return self._settle(waiter)
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._available += 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+
+        if waiter.event is not None:
+            waiter.event.set()
+            return
+        try:
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+        except RuntimeError:
+            # 대기하던 이벤트 루프가 이미 닫힘 → 다음 호출에 넘김
+            self.release()
+
+
+# LLMGateway 클래스: Gemma 호출을 한 곳에서 제어
+# - 동시 호출 수 제한 (대기열 길이는 지표로 노출)
+# - 호출별 마감 시간 (시도마다 타임아웃을 남은 마감 시간 이하로 제한)
+# - 지터가 있는 지수 백오프 재시도 (429의 재시도 안내 시간 우선)
+# - 연속 실패 시 일정 시간 바로 실패 처리하는 circuit breaker
+# 동기 호출(배치 스크립트의 generate_content)과 비동기 호출(client.aio, 웹 서버)을 모두 지원
+# 동시성 슬롯 / circuit 상태 / 지표는 동기, 비동기 호출이 모두 공유
+class LLMGateway:
+    def __init__(
+        self,
+        client: Any,
+        name: str = "gemma",
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        deadline_seconds: float = LLM_DEADLINE_SECONDS,
+        attempt_timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS,
+        base_backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 8.0,
+    ):
+        self.client = client
+        self.name = name
+        self.deadline_seconds = deadline_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self.max_concurrency = max_concurrency
+        self._slots = _FairSlots(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._opened_until = 0.0
+        self._half_open_trial = False
+
+    # ---------------- 호출 ----------------
+
+    # client.models.generate_content와 같은 인자로 호출
+    def generate_content(self, **kwargs) -> Any:
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            self._before_call()
+            self._acquire(deadline)
+            started = time.monotonic()
+            try:
+                response = self.client.models.generate_content(**self._attempt_kwargs(kwargs, deadline))
+            except Exception as e:
+                # 슬롯을 먼저 반납하고 백오프 대기
+                self._release(started)
+                self._record_failure(e)
+                attempt = self._wait_for_retry(e, attempt, deadline)
+                continue
+            except BaseException:
+                self._release(started)
+                raise
+
+            self._release(started)
+            self._record_success()
+            return response
+
+    # client.aio.models.generate_content와 같은 인자로 호출 (스레드 없이 대기)
+    async def agenerate_content(self, **kwargs) -> Any:
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            self._before_call()
+            await self._async_acquire(deadline)
+            started = time.monotonic()
+            try:
+                response = await self.client.aio.models.generate_content(**self._attempt_kwargs(kwargs, deadline))
+            except Exception as e:
+                self._release(started)
+                self._record_failure(e)
+                attempt = await self._await_retry(e, attempt, deadline)
+                continue
+            except BaseException:
+                # 호출 중 취소(CancelledError): 슬롯을 반납하고 그대로 전파
+                self._release(started)
+                raise
+
+            self._release(started)
+            self._record_success()
+            return response
+
+    # client.aio.models.generate_content_stream과 같은 인자로 호출
+    async def astream_content(self, **kwargs) -> AsyncIterator[Any]:
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            self._before_call()
+            await self._async_acquire(deadline)
+            started = time.monotonic()
+            try:
+                response_stream = await self.client.aio.models.generate_content_stream(
+                    **self._attempt_kwargs(kwargs, deadline)
+                )
+                first_chunk = await response_stream.__anext__()
+            except StopAsyncIteration:
+                response_stream, first_chunk = None, None
+            except Exception as e:
+                self._release(started)
+                self._record_failure(e)
+                attempt = await self._await_retry(e, attempt, deadline)
+                continue
+            except BaseException:
+                # 첫 조각을 기다리다 취소(CancelledError): 슬롯을 반납하고 그대로 전파
+                self._release(started)
+                raise
+
+            try:
+                if first_chunk is not None:
+                    yield first_chunk
+                if response_stream is not None:
+                    async for chunk in response_stream:
+                        yield chunk
+            except GeneratorExit:
+                self._record_success()
+                raise
+            except Exception as e:
+                self._record_failure(e)
+                raise
+            finally:
+                self._release(started)
+
+            self._record_success()
+            return
+
+    # ---------------- 동시성 제한 ----------------
+
+    def _acquire(self, deadline: float):
+        with self._lock:
+            self._waiting += 1
+            metrics.set_gauge(f"llm.{self.name}.queue_depth", self._waiting)
+        try:
+            acquired = self._slots.acquire(deadline - time.monotonic())
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                metrics.set_gauge(f"llm.{self.name}.queue_depth", self._waiting)
+
+        if not acquired:
+            with self._lock:
+                self._half_open_trial = False
+            metrics.incr(f"llm.{self.name}.queue_timeout")
+            raise LLMUnavailableError("LLM 호출 대기 시간 초과")
+
+        with self._lock:
+            self._in_flight += 1
+            metrics.set_gauge(f"llm.{self.name}.in_flight", self._in_flight)
+
+    def _release(self, started: float):
+        metrics.observe(f"llm.{self.name}.latency_ms", (time.monotonic() - started) * 1000)
+        with self._lock:
+            self._in_flight -= 1
+            metrics.set_gauge(f"llm.{self.name}.in_flight", self._in_flight)
+        self._slots.release()
+
+    # 동기 호출과 같은 슬롯을 공유 (이벤트 루프를 막지 않고 대기)
+    async def _async_acquire(self, deadline: float):
+        with self._lock:
+            self._waiting += 1
+            metrics.set_gauge(f"llm.{self.name}.queue_depth", self._waiting)
+        try:
+            acquired = await self._slots.acquire_async(deadline - time.monotonic())
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                metrics.set_gauge(f"llm.{self.name}.queue_depth", self._waiting)
+
+        if not acquired:
+            with self._lock:
+                self._half_open_trial = False
+            metrics.incr(f"llm.{self.name}.queue_timeout")
+            raise LLMUnavailableError("LLM 호출 대기 시간 초과")
+
+        with self._lock:
+            self._in_flight += 1
+            metrics.set_gauge(f"llm.{self.name}.in_flight", self._in_flight)
+
+    # 이번 시도의 요청 인자: 타임아웃을 호출 1회 타임아웃과 남은 마감 시간 중 짧은 쪽으로 지정
+    def _attempt_kwargs(self, kwargs: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        # 마감 시간이 이미 지났으면 바로 타임아웃되고, 재시도 단계에서 마감 초과로 실패 처리됨
+        remaining = deadline - time.monotonic()
+        timeout_ms = max(1, int(min(self.attempt_timeout_seconds, remaining) * 1000))
+
+        config = kwargs.get("config")
+        if config is None:
+            config = types.GenerateContentConfig()
+        elif isinstance(config, dict):
+            config = types.GenerateContentConfig(**config)
+        http_options = (config.http_options or types.HttpOptions()).model_copy(update={"timeout": timeout_ms})
+        return {**kwargs, "config": config.model_copy(update={"http_options": http_options})}
+
+    # ---------------- 재시도 ----------------
+
+    # 재시도할 수 있으면 대기 후 다음 attempt 번호를 반환, 아니면 에러를 다시 발생
+    def _wait_for_retry(self, error: Exception, attempt: int, deadline: float) -> int:
+        time.sleep(self._retry_delay(error, attempt, deadline))
+        return attempt + 1
+
+    async def _await_retry(self, error: Exception, attempt: int, deadline: float) -> int:
+        await asyncio.sleep(self._retry_delay(error, attempt, deadline))
+        return attempt + 1
+
+    # 다음 시도까지 대기할 시간(초), 재시도할 수 없으면 에러를 다시 발생
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float) -> float:
+        if attempt >= self.max_retries or not _is_retryable(error):
+            raise error
+
+        # 지수 백오프 + full jitter, 429 재시도 안내가 있으면 그 이상 대기
+        delay = random.uniform(0, min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt)))
+        retry_hint = _retry_hint_seconds(error)
+        if retry_hint is not None:
+            delay = max(delay, retry_hint + random.uniform(0, 1))
+
+        if time.monotonic() + delay >= deadline:
+            raise error
+
+        metrics.incr(f"llm.{self.name}.retry")
+        logger.warning(f"LLM 호출 실패, {delay:.2f}초 후 재시도 ({attempt + 1}/{self.max_retries}): {error}")
+        return delay
+
+    # ---------------- circuit breaker ----------------
+
+    # open 상태면 바로 실패, reset 시간이 지나면 한 번만 시험 호출 허용(half-open)
+    def _before_call(self):
+        with self._lock:
+            if self._consecutive_failures < self.failure_threshold:
+                return
+            if time.monotonic() >= self._opened_until and not self._half_open_trial:
+                self._half_open_trial = True
+                return
+
+        metrics.incr(f"llm.{self.name}.circuit_rejected")
+        raise LLMUnavailableError("LLM provider 일시 차단 중 (circuit open)")
+
+    def _record_success(self):
+        with self._lock:
+            if self._consecutive_failures >= self.failure_threshold:
+                logger.info(f"LLM circuit closed: {self.name}")
+            self._consecutive_failures = 0
+            self._half_open_trial = False
+            metrics.set_gauge(f"llm.{self.name}.circuit_open", 0)
+
+    def _record_failure(self, error: Exception):
+        metrics.incr(f"llm.{self.name}.failure")
+        # 사용자 입력 문제(4xx)는 provider 상태와 무관하므로 제외
+        if not _is_retryable(error):
+            with self._lock:
+                self._half_open_trial = False
+            return
+
+        with self._lock:
+            self._consecutive_failures += 1
+            self._half_open_trial = False
+            if self._consecutive_failures >= self.failure_threshold:
+                self._opened_until = time.monotonic() + self.reset_seconds
+                metrics.set_gauge(f"llm.{self.name}.circuit_open", 1)
+                logger.error(f"LLM circuit open: {self.name}, {self.reset_seconds}초 동안 호출 차단")
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+from core.config import CHAT_MENTION_DEBOUNCE_SECONDS
+from core.metrics import metrics
+from core.room_queue import RoomWorkQueue, get_room_queue
+
+logger = logging.getLogger(__name__)
+
+FlushCallback = Callable[[int, List[Any]], Awaitable[None]]
+
+
+# MentionDebouncer 클래스: 그룹방 챗봇 멘션 모아서 한 번에 처리
+# 방의 첫 멘션부터 window_seconds 동안 들어온 멘션을 모아 한 턴으로 방 큐에 넘김
+# 턴이 실제로 실행될 때 모인 멘션을 가져가므로, 앞 턴을 기다리는 동안 들어온 멘션도 같이 처리됨
+class MentionDebouncer:
+    # {room_id: 모인 멘션 목록}, {room_id: 대기 timer task}
+    def __init__(self, room_queue: RoomWorkQueue, window_seconds: float = CHAT_MENTION_DEBOUNCE_SECONDS):
+        self.room_queue = room_queue
+        self.window_seconds = window_seconds
+        self._pending: Dict[int, List[Any]] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    # 멘션 추가, 방의 첫 멘션이면 timer 시작
+    def add(self, room_id: int, mention: Any, on_flush: FlushCallback):
+        self._pending.setdefault(room_id, []).append(mention)
+        if room_id not in self._timers:
+            self._timers[room_id] = asyncio.create_task(self._wait_and_submit(room_id, on_flush))
+
+    async def _wait_and_submit(self, room_id: int, on_flush: FlushCallback):
+        await asyncio.sleep(self.window_seconds)
+        # 큐가 가득 차 있으면 한 window 더 기다렸다가 다시 시도 (그동안 멘션은 계속 모임)
+        while not self.room_queue.submit(room_id, lambda: self._flush(room_id, on_flush)):
+            logger.warning(f"Room {room_id} mention turn delayed: work queue is full")
+            await asyncio.sleep(self.window_seconds)
+
+    async def _flush(self, room_id: int, on_flush: FlushCallback):
+        self._timers.pop(room_id, None)
+        mentions = self._pending.pop(room_id, [])
+        if not mentions:
+            return
+
+        metrics.incr("chat.mention.turns")
+        metrics.observe("chat.mention.batch_size", len(mentions))
+        if len(mentions) > 1:
+            # 한 턴으로 합쳐져서 아낀 LLM 호출 수
+            metrics.incr("chat.mention.coalesced", len(mentions))
+            metrics.incr("chat.mention.llm_calls_saved", len(mentions) - 1)
+
+        await on_flush(room_id, mentions)
+
+
+# MentionDebouncer 인스턴스를 싱글톤으로 생성
+mention_debouncer = MentionDebouncer(get_room_queue())
+
+# 의존성 주입을 위한 함수
+def get_mention_debouncer():
+    return mention_debouncer
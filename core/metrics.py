@@ -0,0 +1,50 @@
+import threading
+from typing import Dict
+
+# 프로세스 내 간단한 지표 수집기
+# - counter: 누적 횟수 (캐시 hit, 합쳐진 호출 등)
+# - observation: 값 분포 요약 (횟수, 합계, 최대) - 지연 시간 등
+# - gauge: 현재 값 (대기열 길이 등)
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._observations: Dict[str, Dict[str, float]] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            stats = self._observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["sum"] += value
+            stats["max"] = max(stats["max"], value)
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def remove_gauge(self, name: str):
+        with self._lock:
+            self._gauges.pop(name, None)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            observations = {
+                name: {**stats, "avg": stats["sum"] / stats["count"] if stats["count"] else 0.0}
+                for name, stats in self._observations.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "observations": observations,
+                "gauges": dict(self._gauges),
+            }
+
+# 싱글톤
+metrics = MetricsRegistry()
+
+def get_metrics() -> MetricsRegistry:
+    return metrics
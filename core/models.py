@@ -49,6 +49,7 @@ class ChatRoom(Base):
     is_group = Column(Boolean, nullable=False, default=False)    
     last_message_id = Column(Integer, nullable=True) 
     selected_menu = Column(String(255), nullable=True)
+    archived_at = Column(DateTime, nullable=True)  # 메시지를 콜드 아카이브로 옮긴 시각
     
     memberships = relationship("ChatroomMember", cascade="all, delete-orphan")
     messages = relationship("ChatMessage", back_populates="chatroom", passive_deletes=True)
@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio as aioredis
 import os
 from typing import Optional
 import logging
@@ -9,6 +10,7 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
 _redis_client: Optional[redis.Redis] = None
+_async_redis_client: Optional[aioredis.Redis] = None
 
 def get_redis_client() -> redis.Redis:
     global _redis_client
@@ -28,4 +30,19 @@ def get_redis_client() -> redis.Redis:
         except redis.exceptions.ConnectionError as e:
             logger.error(f"Redis 연결 실패: {e}")
             raise ConnectionError(f"Redis 서버 연결 실패: {REDIS_HOST}:{REDIS_PORT}")
-    return _redis_client
\ No newline at end of file
+    return _redis_client
+
+# asyncio용 Redis 클라이언트 (WebSocket pub/sub 등 이벤트 루프 안에서 사용)
+def get_async_redis_client() -> aioredis.Redis:
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=0,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            retry_on_timeout=True
+        )
+        logger.info(f"Async Redis 클라이언트 생성: {REDIS_HOST}:{REDIS_PORT}")
+    return _async_redis_client
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+from core.config import CHAT_ROOM_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# RoomWorkQueue 클래스: 채팅방별 작업 큐
+# 같은 방의 턴은 들어온 순서대로 하나씩 처리하고, 서로 다른 방은 병렬로 처리
+class RoomWorkQueue:
+    # {room_id: asyncio.Queue[작업]}, {room_id: 큐를 비우는 worker task}
+    def __init__(self, max_pending: int = CHAT_ROOM_QUEUE_SIZE):
+        self.max_pending = max_pending
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    # 방 큐에 작업 추가, 큐가 가득 차면 False 반환
+    def submit(self, room_id: int, job: Callable[[], Awaitable[None]]) -> bool:
+        queue = self._queues.get(room_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_pending)
+            self._queues[room_id] = queue
+
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.warning(f"Room {room_id} work queue is full ({self.max_pending})")
+            return False
+
+        # 처리 중인 worker가 없으면 새로 시작
+        if room_id not in self._workers:
+            self._workers[room_id] = asyncio.create_task(self._drain(room_id, queue))
+        return True
+
+    # 현재 대기 중인 작업 수
+    def pending(self, room_id: int) -> int:
+        queue = self._queues.get(room_id)
+        return queue.qsize() if queue else 0
+
+    # 큐가 빌 때까지 순서대로 작업 실행 후 worker 종료 (유휴 방은 메모리를 차지하지 않음)
+    async def _drain(self, room_id: int, queue: asyncio.Queue):
+        try:
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+
+                try:
+                    await job()
+                except Exception as e:
+                    logger.error(f"Room {room_id} turn failed: {e}")
+        finally:
+            self._workers.pop(room_id, None)
+            if queue.empty():
+                self._queues.pop(room_id, None)
+
+# RoomWorkQueue 인스턴스를 싱글톤으로 생성
+room_queue = RoomWorkQueue()
+
+# 의존성 주입을 위한 함수
+def get_room_queue():
+    return room_queue
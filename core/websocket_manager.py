@@ -1,57 +1,315 @@
+import json
+import time
+import asyncio
 import logging
-from typing import List, Dict
+from typing import Dict, Optional, Union
 from fastapi import WebSocket
+from core.config import (
+    WS_BACKEND,
+    WS_SEND_QUEUE_SIZE,
+    WS_APP_HEARTBEAT_ENABLED,
+    WS_PING_INTERVAL,
+    WS_IDLE_TIMEOUT,
+    WS_MAX_CONNECTIONS,
+    WS_MAX_CONNECTIONS_PER_USER,
+)
+from core.redis_client import get_async_redis_client
+from core.metrics import metrics
+from core.ws_frames import ENCODING_JSON, Frame, encode_frame
 
 # 로깅 설정
 logger = logging.getLogger(__name__)
 
+# WebSocketConnection 클래스: 연결 하나와 전송 대기 큐, 큐를 비우는 writer task
+class WebSocketConnection:
+    def __init__(self, room_id: int, uid: str, websocket: WebSocket, max_queue: int, encoding: str = ENCODING_JSON):
+        self.room_id = room_id
+        self.uid = uid
+        self.websocket = websocket
+        self.encoding = encoding  # 클라이언트가 요청한 프레임 인코딩 (json | msgpack)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.writer: Optional[asyncio.Task] = None
+        # 마지막으로 클라이언트 프레임(pong 포함)을 받은 시각
+        self.last_seen = time.monotonic()
+
+
 # ConnectionManager 클래스: 모든 활성 WebSocket 연결을 room_id별로 저장, 관리
 class ConnectionManager:
-    # {room_id: [{uid: str, websocket: WebSocket}, ...]}
-    def __init__(self):
-        self.active_connections: Dict[int, List[Dict]] = {}
+    # {room_id: {websocket: WebSocketConnection}} - 소켓 기준 O(1) 추가/제거
+    def __init__(
+        self,
+        send_queue_size: int = WS_SEND_QUEUE_SIZE,
+        ping_interval: float = WS_PING_INTERVAL,
+        idle_timeout: float = WS_IDLE_TIMEOUT,
+        heartbeat_enabled: bool = WS_APP_HEARTBEAT_ENABLED,
+        max_connections: int = WS_MAX_CONNECTIONS,
+        max_connections_per_user: int = WS_MAX_CONNECTIONS_PER_USER,
+    ):
+        self.active_connections: Dict[int, Dict[WebSocket, WebSocketConnection]] = {}
+        self.send_queue_size = send_queue_size
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.heartbeat_enabled = heartbeat_enabled
+        self.max_connections = max_connections
+        self.max_connections_per_user = max_connections_per_user
+        self.connection_count = 0
+        self.user_connection_counts: Dict[str, int] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
 
     # 새로운 WebSocket 연결을 수락, 등록
-    async def connect(self, room_id: int, uid: str, websocket: WebSocket):
+    # 프로세스 / 사용자 연결 수 한도를 넘으면 수락 후 바로 닫고 False 반환
+    async def connect(self, room_id: int, uid: str, websocket: WebSocket, encoding: str = ENCODING_JSON) -> bool:
         await websocket.accept()
-        
-        connection_info = {"uid": uid, "websocket": websocket}
-        
+
+        if self.connection_count >= self.max_connections:
+            logger.warning(f"WebSocket 연결 거부 (프로세스 한도 {self.max_connections}): Room {room_id}, User {uid}")
+            metrics.incr("ws.rejected.process_limit")
+            await self._close_quietly(websocket, 1013, "서버 연결 수 초과")
+            return False
+
+        if self.user_connection_counts.get(uid, 0) >= self.max_connections_per_user:
+            logger.warning(f"WebSocket 연결 거부 (사용자 한도 {self.max_connections_per_user}): Room {room_id}, User {uid}")
+            metrics.incr("ws.rejected.user_limit")
+            await self._close_quietly(websocket, 1008, "사용자 연결 수 초과")
+            return False
+
+        connection = WebSocketConnection(room_id, uid, websocket, self.send_queue_size, encoding)
+        connection.writer = asyncio.create_task(self._write_loop(connection))
+
         # 해당 room_id가 없으면 새로 생성
         if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        
+            self.active_connections[room_id] = {}
+
         # 연결 추가
-        self.active_connections[room_id].append(connection_info)
+        self.active_connections[room_id][websocket] = connection
+        self.connection_count += 1
+        self.user_connection_counts[uid] = self.user_connection_counts.get(uid, 0) + 1
+        self._update_gauges(room_id)
+
+        # 첫 연결 시 앱 수준 heartbeat 시작 (WS_APP_HEARTBEAT_ENABLED일 때만)
+        if self.heartbeat_enabled and (self._heartbeat is None or self._heartbeat.done()):
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
         logger.info(f"WebSocket connected: Room {room_id}, User {uid}. Total connections: {len(self.active_connections[room_id])}")
+        return True
 
-    # WebSocket 연결 해제, 관리자에서 제거
+    # WebSocket 연결 해제, 관리목록에서 제거 (여러 번 호출돼도 안전)
     def disconnect(self, room_id: int, websocket: WebSocket):
-        if room_id in self.active_connections:
-            # 해당 WebSocket 객체를 찾아 리스트에서 제거
-            self.active_connections[room_id] = [
-                conn for conn in self.active_connections[room_id] 
-                if conn["websocket"] is not websocket
-            ]
-            
-            # 리스트가 비면 방 정보 제거 (메모리 관리)
-            if not self.active_connections[room_id]:
+        room_connections = self.active_connections.get(room_id)
+        if room_connections is not None:
+            connection = room_connections.pop(websocket, None)
+            if connection:
+                if connection.writer and connection.writer is not asyncio.current_task():
+                    connection.writer.cancel()
+
+                self.connection_count -= 1
+                remaining = self.user_connection_counts.get(connection.uid, 1) - 1
+                if remaining > 0:
+                    self.user_connection_counts[connection.uid] = remaining
+                else:
+                    self.user_connection_counts.pop(connection.uid, None)
+
+            # 방이 비면 방 정보 제거 (메모리 관리)
+            if not room_connections:
                 del self.active_connections[room_id]
-        
-        logger.info(f"WebSocket disconnected: Room {room_id}. Remaining connections in room: {len(self.active_connections.get(room_id, []))}")
+
+            self._update_gauges(room_id)
+
+        logger.info(f"WebSocket disconnected: Room {room_id}. Remaining connections in room: {len(self.active_connections.get(room_id, {}))}")
 
     # 특정 방에 연결된 모든 클라이언트에게 메시지를 브로드캐스트
-    async def broadcast(self, room_id: int, message: str):
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                try:
-                    await connection["websocket"].send_text(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting message to room {room_id}, user {connection['uid']}: {e}")
+    # message는 프레임 dict (또는 이미 직렬화된 JSON 문자열)
+    async def broadcast(self, room_id: int, message: Frame):
+        await self.send_local(room_id, message)
+
+    # 이 프로세스에 연결된 클라이언트에게만 전송
+    # 실제 전송은 연결별 writer task가 담당하므로 느린 클라이언트가 방 전체를 지연시키지 않음
+    # 인코딩은 브로드캐스트당 인코딩 종류별로 한 번만 수행
+    async def send_local(self, room_id: int, message: Frame):
+        room_connections = self.active_connections.get(room_id)
+        if not room_connections:
+            return
+
+        encoded: Dict[str, Union[str, bytes]] = {}
+        for connection in list(room_connections.values()):
+            if connection.encoding not in encoded:
+                encoded[connection.encoding] = encode_frame(message, connection.encoding)
+            self._enqueue(connection, encoded[connection.encoding])
+
+    # 특정 연결 하나에만 전송 (에러 안내 등)
+    async def send_personal(self, room_id: int, websocket: WebSocket, message: Frame):
+        connection = self.active_connections.get(room_id, {}).get(websocket)
+        if connection:
+            self._enqueue(connection, encode_frame(message, connection.encoding))
+
+    def _enqueue(self, connection: WebSocketConnection, payload: Union[str, bytes]):
+        try:
+            connection.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # 큐가 가득 찬 느린/죽은 클라이언트는 연결 종료
+            logger.warning(f"Dropping slow WebSocket consumer: room {connection.room_id}, user {connection.uid}")
+            self._drop(connection, code=1013, reason="전송 대기열 초과")
+
+    # 연결별 큐를 비우며 순서대로 전송
+    async def _write_loop(self, connection: WebSocketConnection):
+        while True:
+            message = await connection.queue.get()
+            try:
+                if isinstance(message, bytes):
+                    await connection.websocket.send_bytes(message)
+                else:
+                    await connection.websocket.send_text(message)
+            except Exception as e:
+                logger.error(f"Error broadcasting message to room {connection.room_id}, user {connection.uid}: {e}")
+                self._drop(connection)
+                return
+
+    # 클라이언트 프레임을 받을 때마다 호출 (pong 포함) - 살아있는 연결로 표시
+    def touch(self, room_id: int, websocket: WebSocket):
+        connection = self.active_connections.get(room_id, {}).get(websocket)
+        if connection:
+            connection.last_seen = time.monotonic()
+
+    # ping_interval마다 모든 연결에 ping을 보내고, idle_timeout 동안 응답이 없는 연결은 종료
+    # (close 프레임 없이 끊긴 소켓이 목록에 계속 남아 브로드캐스트 대상이 되지 않도록)
+    async def _heartbeat_loop(self):
+        ping_frame = {"type": "ping"}
+        while self.active_connections:
+            await asyncio.sleep(self.ping_interval)
+
+            now = time.monotonic()
+            encoded: Dict[str, Union[str, bytes]] = {}
+            for room_connections in list(self.active_connections.values()):
+                for connection in list(room_connections.values()):
+                    if now - connection.last_seen > self.idle_timeout:
+                        logger.info(f"Evicting idle WebSocket: room {connection.room_id}, user {connection.uid}")
+                        metrics.incr("ws.evicted.idle")
+                        self._drop(connection, code=1001, reason="응답 없음")
+                        continue
+
+                    if connection.encoding not in encoded:
+                        encoded[connection.encoding] = encode_frame(ping_frame, connection.encoding)
+                    self._enqueue(connection, encoded[connection.encoding])
+
+    # 프로세스 / 방별 연결 수 지표
+    def _update_gauges(self, room_id: int):
+        metrics.set_gauge("ws.connections", self.connection_count)
+        metrics.set_gauge("ws.rooms", len(self.active_connections))
+        room_connections = self.active_connections.get(room_id)
+        if room_connections:
+            metrics.set_gauge(f"ws.room_connections.{room_id}", len(room_connections))
+        else:
+            metrics.remove_gauge(f"ws.room_connections.{room_id}")
+
+    # 연결을 목록에서 제거하고 소켓 종료
+    def _drop(self, connection: WebSocketConnection, code: int = 1011, reason: str = ""):
+        self.disconnect(connection.room_id, connection.websocket)
+        asyncio.create_task(self._close_quietly(connection.websocket, code, reason))
+
+    async def _close_quietly(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+
+# RedisConnectionManager 클래스: 여러 uvicorn worker / 노드 간 브로드캐스트
+# broadcast는 방별 Redis 채널에 publish만 하고,
+# 각 프로세스는 자기에게 연결된 소켓이 있는 방 채널을 subscribe해서 로컬 소켓으로 전달
+class RedisConnectionManager(ConnectionManager):
+    channel_prefix = "chat:room:"
+
+    def __init__(self, send_queue_size: int = WS_SEND_QUEUE_SIZE):
+        super().__init__(send_queue_size)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def _channel(self, room_id: int) -> str:
+        return f"{self.channel_prefix}{room_id}"
+
+    async def connect(self, room_id: int, uid: str, websocket: WebSocket, encoding: str = ENCODING_JSON) -> bool:
+        is_first_in_room = room_id not in self.active_connections
+        if not await super().connect(room_id, uid, websocket, encoding):
+            return False
+
+        # 이 프로세스에서 방의 첫 연결이면 방 채널 구독 시작
+        if is_first_in_room:
+            await self._subscribe(room_id)
+        return True
+
+    def disconnect(self, room_id: int, websocket: WebSocket):
+        had_room = room_id in self.active_connections
+        super().disconnect(room_id, websocket)
+
+        # 방의 마지막 로컬 연결이 끊기면 구독 해제
+        if had_room and room_id not in self.active_connections:
+            asyncio.create_task(self._unsubscribe(room_id))
+
+    async def broadcast(self, room_id: int, message: Frame):
+        try:
+            # 채널에는 JSON으로 한 번만 직렬화해서 publish, 각 프로세스가 연결별 인코딩으로 변환
+            await get_async_redis_client().publish(self._channel(room_id), encode_frame(message))
+        except Exception as e:
+            # Redis 장애 시 최소한 같은 프로세스의 클라이언트에게는 전달
+            logger.error(f"Redis publish 실패 (room {room_id}), 로컬 전송으로 대체: {e}")
+            await self.send_local(room_id, message)
+
+    async def _subscribe(self, room_id: int):
+        if self._pubsub is None:
+            self._pubsub = get_async_redis_client().pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._channel(room_id))
+
+        # 구독이 생긴 뒤에 리스너 시작 (구독 없이 get_message를 호출하면 오류)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _unsubscribe(self, room_id: int):
+        # 그 사이 다시 연결된 경우 구독 유지
+        if room_id in self.active_connections or self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(self._channel(room_id))
+        except Exception as e:
+            logger.error(f"Redis unsubscribe 실패 (room {room_id}): {e}")
+
+    # 구독 채널 메시지를 로컬 소켓으로 전달
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+
+                room_id = int(message["channel"][len(self.channel_prefix):])
+                await self.send_local(room_id, message["data"])
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis pub/sub 수신 오류: {e}")
+                await asyncio.sleep(1)
+                await self._resubscribe()
+
+    # 연결이 끊겼다 복구된 경우 현재 로컬 방들 다시 구독
+    async def _resubscribe(self):
+        try:
+            channels = [self._channel(room_id) for room_id in self.active_connections]
+            if channels:
+                await self._pubsub.subscribe(*channels)
+        except Exception as e:
+            logger.error(f"Redis 재구독 실패: {e}")
+
+
+# 설정(WS_BACKEND)에 따라 ConnectionManager 생성
+def create_connection_manager() -> ConnectionManager:
+    if WS_BACKEND == "redis":
+        logger.info("WebSocket 백엔드: Redis pub/sub")
+        return RedisConnectionManager()
+    return ConnectionManager()
 
 # ConnectionManager 인스턴스를 싱글톤으로 생성
-manager = ConnectionManager()
+manager = create_connection_manager()
 
 # 의존성 주입을 위한 함수: FastAPI Dependencies를 통해 ConnectionManager 인스턴스 제공
 def get_connection_manager():
-    return manager
\ No newline at end of file
+    return manager
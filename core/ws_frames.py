@@ -0,0 +1,69 @@
+import json
+import datetime
+from typing import Any, Dict, Union
+import msgpack
+
+# WebSocket 프레임 인코딩
+# - json: 기존 클라이언트용 텍스트 프레임 (카드 content는 JSON 문자열 그대로)
+# - msgpack: 바이너리 프레임, 카드 content는 구조화된 데이터로, 시각은 epoch ms 정수로, 빈 필드는 생략
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+SUPPORTED_ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK)
+
+# content에 JSON 문자열이 들어있는 메시지 타입
+STRUCTURED_MESSAGE_TYPES = {"restaurant_cards"}
+
+Frame = Union[str, Dict[str, Any]]
+
+
+# 쿼리 파라미터로 요청한 인코딩 (모르는 값이면 json)
+def negotiate_encoding(requested: str = None) -> str:
+    if requested and requested.lower() in SUPPORTED_ENCODINGS:
+        return requested.lower()
+    return ENCODING_JSON
+
+
+def _compact_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    compact = {key: value for key, value in message.items() if value is not None}
+
+    content = compact.get("content")
+    if compact.get("message_type") in STRUCTURED_MESSAGE_TYPES and isinstance(content, str):
+        try:
+            compact["content"] = json.loads(content)
+        except ValueError:
+            pass
+
+    timestamp = compact.get("timestamp")
+    if isinstance(timestamp, str):
+        try:
+            parsed = datetime.datetime.fromisoformat(timestamp)
+            # DB 시각은 naive UTC → 서버 로컬 시간대로 해석되지 않게 UTC로 지정
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            compact["timestamp"] = int(parsed.timestamp() * 1000)
+        except ValueError:
+            pass
+
+    return compact
+
+
+# msgpack용 프레임 변환
+def compact_frame(frame: Dict[str, Any]) -> Dict[str, Any]:
+    compact = {key: value for key, value in frame.items() if value is not None}
+    if isinstance(compact.get("message"), dict):
+        compact["message"] = _compact_message(compact["message"])
+    if isinstance(compact.get("messages"), list):
+        compact["messages"] = [_compact_message(m) for m in compact["messages"]]
+    return compact
+
+
+# 프레임(dict 또는 이미 직렬화된 JSON 문자열)을 인코딩
+def encode_frame(frame: Frame, encoding: str = ENCODING_JSON) -> Union[str, bytes]:
+    if encoding == ENCODING_MSGPACK:
+        if isinstance(frame, str):
+            frame = json.loads(frame)
+        return msgpack.packb(compact_frame(frame), use_bin_type=True)
+
+    if isinstance(frame, str):
+        return frame
+    return json.dumps(frame, ensure_ascii=False)
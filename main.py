@@ -5,8 +5,10 @@ import firebase_admin
 from firebase_admin import credentials
 import os
 from dotenv import load_dotenv
-from api import auth, users, chat, saju, restaurants, scraps, friends, reservations
+from api import auth, users, chat, saju, restaurants, scraps, friends, reservations, metrics
 from core.s3 import initialize_s3_client
+from core.config import CHAT_ARCHIVE_ENABLED, CHAT_TURN_MODE, WS_BACKEND
+from services.chat_archive_service import run_chat_archiver
 from vectordb.vectordb_util import get_embeddings, get_chroma_client
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -85,6 +87,14 @@ async def startup_event():
         print(f"초기화 중 오류: {e}")
         raise
 
+    # 오래된 채팅방 메시지 아카이브 작업 시작
+    if CHAT_ARCHIVE_ENABLED:
+        asyncio.create_task(run_chat_archiver())
+
+    # worker 모드의 답변은 방 채널 publish로만 전달됨
+    if CHAT_TURN_MODE == "worker" and WS_BACKEND != "redis":
+        print("경고: CHAT_TURN_MODE=worker 는 WS_BACKEND=redis 가 필요합니다. 답변이 클라이언트에 전달되지 않습니다.")
+
 # CORS 설정
 origins = [
     "http://127.0.0.1:5500",
@@ -112,3 +122,4 @@ app.include_router(restaurants.router, prefix="/api")
 app.include_router(scraps.router, prefix="/api")
 app.include_router(friends.router, prefix="/api")
 app.include_router(reservations.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
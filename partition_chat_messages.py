@@ -0,0 +1,154 @@
+import sys
+import datetime
+from sqlalchemy import text
+from core.db import engine
+
+# Chat_messages 테이블 월별 RANGE 파티셔닝 / 아카이브 컬럼 추가 스크립트
+#
+# 사용법
+#   python partition_chat_messages.py migrate   # 최초 1회: FK 제거, PK (id, timestamp), 월별 파티션 생성
+#   python partition_chat_messages.py extend    # 매월 실행: 앞으로 몇 달치 파티션을 미리 추가
+#
+# MySQL 파티션 테이블 제약
+# - 모든 unique key(PK 포함)에 파티션 컬럼(timestamp)이 들어가야 함 → PK를 (id, timestamp)로 변경
+#   id는 여전히 auto increment로 유일하므로 ORM 매핑(id 단일 PK)은 그대로 사용
+# - 외래 키를 쓸 수 없음 → room_id FK(ON DELETE CASCADE) 제거, 채팅방 삭제 시 앱에서 메시지를 직접 삭제
+
+TABLE_NAME = "Chat_messages"
+MONTHS_AHEAD = 3
+
+
+def month_start(d: datetime.date) -> datetime.date:
+    return d.replace(day=1)
+
+
+def next_month(d: datetime.date) -> datetime.date:
+    return (d.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def partition_name(d: datetime.date) -> str:
+    return f"p{d.strftime('%Y%m')}"
+
+
+# start 달부터 end 달까지 월별 파티션 정의 (각 파티션은 다음 달 1일 미만)
+def build_partition_defs(start: datetime.date, end: datetime.date) -> list:
+    defs = []
+    current = month_start(start)
+    while current <= end:
+        upper = next_month(current)
+        defs.append(f"PARTITION {partition_name(current)} VALUES LESS THAN ('{upper.isoformat()}')")
+        current = upper
+    return defs
+
+
+def existing_partitions(conn) -> list:
+    rows = conn.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table": TABLE_NAME},
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def migrate():
+    with engine.begin() as conn:
+        if existing_partitions(conn):
+            print("이미 파티셔닝된 테이블입니다. extend를 사용하세요.")
+            return
+
+        # 1) 아카이브 컬럼 추가
+        has_archived_at = conn.execute(
+            text(
+                "SELECT COUNT(*) FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Chat_rooms' AND COLUMN_NAME = 'archived_at'"
+            )
+        ).scalar()
+        if not has_archived_at:
+            print("[1/4] Chat_rooms.archived_at 컬럼 추가")
+            conn.execute(text("ALTER TABLE Chat_rooms ADD COLUMN archived_at DATETIME NULL"))
+
+        # 2) room_id 외래 키 제거 (인덱스는 유지)
+        foreign_keys = conn.execute(
+            text(
+                "SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND CONSTRAINT_TYPE = 'FOREIGN KEY'"
+            ),
+            {"table": TABLE_NAME},
+        ).fetchall()
+        for (fk_name,) in foreign_keys:
+            print(f"[2/4] 외래 키 제거: {fk_name}")
+            conn.execute(text(f"ALTER TABLE {TABLE_NAME} DROP FOREIGN KEY `{fk_name}`"))
+
+        # 3) PK에 파티션 컬럼 포함 (timestamp는 NOT NULL이어야 함)
+        print("[3/4] PRIMARY KEY (id, timestamp) 변경")
+        conn.execute(text(f"UPDATE {TABLE_NAME} SET `timestamp` = UTC_TIMESTAMP() WHERE `timestamp` IS NULL"))
+        conn.execute(
+            text(
+                f"ALTER TABLE {TABLE_NAME} "
+                "MODIFY `timestamp` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+                "DROP PRIMARY KEY, ADD PRIMARY KEY (id, `timestamp`)"
+            )
+        )
+
+        # 4) 가장 오래된 메시지 달부터 MONTHS_AHEAD 달 뒤까지 월별 파티션
+        oldest = conn.execute(text(f"SELECT MIN(`timestamp`) FROM {TABLE_NAME}")).scalar()
+        today = datetime.date.today()
+        start = oldest.date() if oldest else today
+        end = today
+        for _ in range(MONTHS_AHEAD):
+            end = next_month(end)
+
+        partition_defs = build_partition_defs(start, end)
+        partition_defs.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+        print(f"[4/4] 월별 파티션 {len(partition_defs) - 1}개 생성")
+        conn.execute(
+            text(
+                f"ALTER TABLE {TABLE_NAME} PARTITION BY RANGE COLUMNS(`timestamp`) ("
+                + ", ".join(partition_defs)
+                + ")"
+            )
+        )
+    print("파티셔닝 완료")
+
+
+# pmax 파티션을 쪼개 앞으로 MONTHS_AHEAD 달치 파티션을 미리 만들어 둠
+def extend():
+    with engine.begin() as conn:
+        partitions = [p for p in existing_partitions(conn) if p != "pmax"]
+        if not partitions:
+            print("파티셔닝되지 않은 테이블입니다. migrate를 먼저 실행하세요.")
+            return
+
+        last = datetime.datetime.strptime(partitions[-1][1:], "%Y%m").date()
+        end = datetime.date.today()
+        for _ in range(MONTHS_AHEAD):
+            end = next_month(end)
+
+        partition_defs = build_partition_defs(next_month(last), end)
+        if not partition_defs:
+            print("추가할 파티션이 없습니다.")
+            return
+
+        partition_defs.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+        conn.execute(
+            text(
+                f"ALTER TABLE {TABLE_NAME} REORGANIZE PARTITION pmax INTO ("
+                + ", ".join(partition_defs)
+                + ")"
+            )
+        )
+        print(f"파티션 {len(partition_defs) - 1}개 추가")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "migrate":
+        migrate()
+    elif command == "extend":
+        extend()
+    else:
+        print("사용법: python partition_chat_messages.py [migrate|extend]")
+        sys.exit(1)
@@ -0,0 +1,272 @@
+import os
+import io
+import gzip
+import json
+import asyncio
+import datetime
+from typing import List, Dict, Any, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from core import s3
+from core.db import session_scope
+from core.models import ChatRoom, ChatMessage
+from core.redis_client import get_redis_client
+from core.config import (
+    CHAT_ARCHIVE_INACTIVE_DAYS,
+    CHAT_ARCHIVE_INTERVAL_SECONDS,
+    CHAT_ARCHIVE_BATCH_SIZE,
+    CHAT_ARCHIVE_S3_BUCKET,
+    CHAT_ARCHIVE_DIR,
+    CHAT_ARCHIVE_S3_PREFIX,
+)
+from services.chat_message_events import get_history_cache_service, serialize_chat_message
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 여러 worker 중 한 곳에서만 아카이브 작업을 돌리기 위한 락
+ARCHIVER_LOCK_KEY = "chat:archiver:lock"
+
+
+# 오래 활동이 없는 채팅방의 메시지를 gzip JSONL로 옮기고 핫 테이블에서 삭제
+# - 전용 비공개 S3 버킷(CHAT_ARCHIVE_S3_BUCKET)이 있으면 S3, 아니면 영구 볼륨의 CHAT_ARCHIVE_DIR에 저장
+# - 저장소가 설정되지 않았으면 아카이브하지 않음
+# - 목록 미리보기용 마지막 메시지(last_message_id)는 테이블에 남겨둠
+# - 아카이브된 방을 다시 열면 restore_room으로 되살림
+class ChatArchiveService:
+
+    def __init__(self):
+        self.bucket = CHAT_ARCHIVE_S3_BUCKET
+        self.archive_dir = CHAT_ARCHIVE_DIR
+
+    # ---------------- 저장소 ----------------
+
+    # 아카이브를 보관할 영구 저장소가 있는지
+    @property
+    def is_storage_configured(self) -> bool:
+        return bool(self.bucket or self.archive_dir)
+
+    # 모듈 수준 S3 클라이언트 재사용 (처음 사용할 때 한 번만 생성)
+    @property
+    def s3_client(self):
+        if not self.bucket:
+            return None
+        if s3.S3_CLIENT is None:
+            s3.initialize_s3_client()
+        return s3.S3_CLIENT
+
+    def _s3_key(self, room_id: int) -> str:
+        return f"{CHAT_ARCHIVE_S3_PREFIX}/room-{room_id}.jsonl.gz"
+
+    def _local_path(self, room_id: int) -> str:
+        return os.path.join(self.archive_dir, f"room-{room_id}.jsonl.gz")
+
+    def _write_archive(self, room_id: int, data: bytes):
+        if self.bucket:
+            s3_client = self.s3_client
+            if s3_client is None:
+                raise RuntimeError("아카이브 S3 클라이언트를 초기화할 수 없습니다.")
+            s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(room_id),
+                Body=data,
+                ContentType="application/gzip",
+            )
+            return
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = self._local_path(room_id) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._local_path(room_id))
+
+    def _read_archive(self, room_id: int) -> Optional[bytes]:
+        try:
+            if self.bucket:
+                obj = self.s3_client.get_object(Bucket=self.bucket, Key=self._s3_key(room_id))
+                return obj["Body"].read()
+
+            with open(self._local_path(room_id), "rb") as f:
+                return f.read()
+        except Exception as e:
+            logger.error(f"아카이브 읽기 실패 (room {room_id}): {e}")
+            return None
+
+    def delete_archive(self, room_id: int):
+        try:
+            if self.bucket:
+                self.s3_client.delete_object(Bucket=self.bucket, Key=self._s3_key(room_id))
+            elif self.archive_dir and os.path.exists(self._local_path(room_id)):
+                os.remove(self._local_path(room_id))
+        except Exception as e:
+            logger.error(f"아카이브 삭제 실패 (room {room_id}): {e}")
+
+    # ---------------- 아카이브 ----------------
+
+    # 마지막 메시지가 inactive_days보다 오래된, 아직 아카이브되지 않은 방 id
+    def find_inactive_room_ids(
+        self,
+        db: Session,
+        inactive_days: int = CHAT_ARCHIVE_INACTIVE_DAYS,
+        limit: int = CHAT_ARCHIVE_BATCH_SIZE,
+    ) -> List[int]:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=inactive_days)
+        rows = (
+            db.query(ChatMessage.room_id)
+            .join(ChatRoom, ChatRoom.id == ChatMessage.room_id)
+            .filter(ChatRoom.archived_at.is_(None))
+            .group_by(ChatMessage.room_id)
+            .having(func.max(ChatMessage.timestamp) < cutoff)
+            .limit(limit)
+            .all()
+        )
+        return [row[0] for row in rows]
+
+    def archive_room(self, db: Session, room_id: int) -> int:
+        # 영구 저장소 없이 MySQL에서 지우면 메시지가 사라지므로 거부
+        if not self.is_storage_configured:
+            logger.error("아카이브 저장소(CHAT_ARCHIVE_S3_BUCKET / CHAT_ARCHIVE_DIR)가 설정되지 않아 아카이브하지 않습니다.")
+            return 0
+
+        # 방 행을 잠가서 같은 방에 새 메시지가 커밋되는 것과 겹치지 않게 함
+        room = db.query(ChatRoom).filter(ChatRoom.id == room_id).with_for_update().first()
+        if not room or room.archived_at:
+            db.rollback()
+            return 0
+
+        messages = (
+            db.query(ChatMessage)
+            .filter(ChatMessage.room_id == room_id)
+            .order_by(ChatMessage.id.asc())
+            .all()
+        )
+        if not messages:
+            db.rollback()
+            return 0
+
+        # 이전에 복원 후 다시 아카이브하는 경우도 파일 하나에 전체 메시지가 담김
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+            for msg in messages:
+                gz.write((json.dumps(serialize_chat_message(msg), ensure_ascii=False) + "\n").encode("utf-8"))
+        self._write_archive(room_id, buffer.getvalue())
+
+        max_id = messages[-1].id
+        (
+            db.query(ChatMessage)
+            .filter(
+                ChatMessage.room_id == room_id,
+                ChatMessage.id <= max_id,
+                ChatMessage.id != room.last_message_id,
+            )
+            .delete(synchronize_session=False)
+        )
+        room.archived_at = datetime.datetime.utcnow()
+        db.commit()
+
+        get_history_cache_service().invalidate(room_id)
+        logger.info(f"채팅방 아카이브 완료: room {room_id}, 메시지 {len(messages)}개")
+        return len(messages)
+
+    def archive_inactive_rooms(self, db: Session) -> int:
+        if not self.is_storage_configured:
+            logger.error("아카이브 저장소(CHAT_ARCHIVE_S3_BUCKET / CHAT_ARCHIVE_DIR)가 설정되지 않아 아카이브하지 않습니다.")
+            return 0
+
+        archived = 0
+        for room_id in self.find_inactive_room_ids(db):
+            try:
+                if self.archive_room(db, room_id):
+                    archived += 1
+            except Exception as e:
+                db.rollback()
+                logger.error(f"채팅방 아카이브 실패 (room {room_id}): {e}")
+        return archived
+
+    # ---------------- 복원 ----------------
+
+    # 아카이브된 메시지를 원래 id / 시각 그대로 다시 넣음
+    # ORM 세션 이벤트(새 메시지 알림)를 타지 않도록 Core insert 사용
+    def restore_room(self, db: Session, room: ChatRoom) -> int:
+        if not room.archived_at:
+            return 0
+
+        # 방 행을 잠그고 다시 확인: 같은 방을 동시에 복원하면 먼저 잠근 쪽만 복원하고,
+        # 나머지는 그 커밋을 기다린 뒤 archived_at이 비어 있으므로 건너뜀 (같은 id 중복 insert 방지)
+        room = (
+            db.query(ChatRoom)
+            .filter(ChatRoom.id == room.id)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
+        if not room or not room.archived_at:
+            db.rollback()
+            return 0
+
+        data = self._read_archive(room.id)
+        if data is None:
+            db.rollback()
+            return 0
+
+        existing_ids = {
+            row[0] for row in db.query(ChatMessage.id).filter(ChatMessage.room_id == room.id)
+        }
+        rows: List[Dict[str, Any]] = []
+        for line in gzip.decompress(data).decode("utf-8").splitlines():
+            if not line:
+                continue
+            msg = json.loads(line)
+            if msg["id"] in existing_ids:
+                continue
+            rows.append(
+                {
+                    "id": msg["id"],
+                    "room_id": room.id,
+                    "sender_id": msg["sender_id"],
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "message_type": msg["message_type"],
+                    "timestamp": datetime.datetime.fromisoformat(msg["timestamp"]) if msg["timestamp"] else None,
+                }
+            )
+
+        if rows:
+            db.execute(ChatMessage.__table__.insert(), rows)
+        room.archived_at = None
+        db.commit()
+
+        self.delete_archive(room.id)
+        get_history_cache_service().invalidate(room.id)
+        logger.info(f"채팅방 복원 완료: room {room.id}, 메시지 {len(rows)}개")
+        return len(rows)
+
+
+# 주기적으로 오래된 방을 아카이브하는 백그라운드 루프 (서버 시작 시 실행)
+async def run_chat_archiver():
+    if not ChatArchiveService().is_storage_configured:
+        logger.error("CHAT_ARCHIVE_ENABLED 이지만 아카이브 저장소(CHAT_ARCHIVE_S3_BUCKET / CHAT_ARCHIVE_DIR)가 없어 아카이브 작업을 시작하지 않습니다.")
+        return
+
+    while True:
+        await asyncio.sleep(CHAT_ARCHIVE_INTERVAL_SECONDS)
+        try:
+            # 다른 worker가 이미 돌리고 있으면 이번 주기는 건너뜀
+            locked = await asyncio.to_thread(
+                get_redis_client().set, ARCHIVER_LOCK_KEY, "1", nx=True, ex=CHAT_ARCHIVE_INTERVAL_SECONDS
+            )
+            if not locked:
+                continue
+
+            archived = await asyncio.to_thread(_archive_inactive_rooms_sync)
+            if archived:
+                logger.info(f"채팅방 아카이브: {archived}개 방 처리")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"채팅방 아카이브 작업 실패: {e}")
+
+
+def _archive_inactive_rooms_sync() -> int:
+    with session_scope() as db:
+        return ChatArchiveService().archive_inactive_rooms(db)
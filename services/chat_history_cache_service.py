@@ -0,0 +1,73 @@
+import json
+from typing import List, Dict, Any, Optional
+from core.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 채팅방별 최근 대화 링 버퍼 (Redis List)
+# 메시지가 저장될 때마다 뒤에 추가하고 window 크기로 잘라서 유지
+class ChatHistoryCacheService:
+
+    def __init__(self, max_messages: int = 10):
+        self.redis_client = get_redis_client()
+        self.max_messages = max_messages
+        self.history_ttl = 86400  # 24시간 (오래 쉬는 방은 다음 턴에 DB에서 다시 채움)
+
+    def _history_key(self, room_id: int) -> str:
+        return f"chatroom:history:{room_id}"
+
+    # 최근 대화 조회 (한 번의 LRANGE), 캐시가 없으면 None → DB에서 채워야 함
+    def get_recent_messages(self, room_id: int) -> Optional[List[Dict[str, Any]]]:
+        try:
+            raw_messages = self.redis_client.lrange(self._history_key(room_id), 0, -1)
+            if not raw_messages:
+                return None
+            return [json.loads(raw) for raw in raw_messages]
+        except Exception as e:
+            logger.error(f"대화 기록 캐시 조회 실패 (room {room_id}): {e}")
+            return None
+
+    # DB에서 읽은 최근 대화로 버퍼 초기화 (cold start)
+    def seed(self, room_id: int, messages: List[Dict[str, Any]]) -> bool:
+        if not messages:
+            return False
+        try:
+            key = self._history_key(room_id)
+            pipeline = self.redis_client.pipeline(transaction=True)
+            pipeline.delete(key)
+            pipeline.rpush(key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+            pipeline.ltrim(key, -self.max_messages, -1)
+            pipeline.expire(key, self.history_ttl)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"대화 기록 캐시 초기화 실패 (room {room_id}): {e}")
+            return False
+
+    # 새 메시지 추가 + window 크기로 자르기
+    # 버퍼가 없는 방(cold)은 RPUSHX로 건너뜀 → 일부만 담긴 버퍼가 생기지 않음
+    def append_messages(self, room_id: int, messages: List[Dict[str, Any]]) -> bool:
+        if not messages:
+            return False
+        try:
+            key = self._history_key(room_id)
+            pipeline = self.redis_client.pipeline(transaction=True)
+            pipeline.rpushx(key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+            pipeline.ltrim(key, -self.max_messages, -1)
+            pipeline.expire(key, self.history_ttl)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"대화 기록 캐시 추가 실패 (room {room_id}): {e}")
+            # 버퍼가 어긋났을 수 있으니 지워서 다음 턴에 DB에서 다시 채우게 함
+            self.invalidate(room_id)
+            return False
+
+    def invalidate(self, room_id: int) -> bool:
+        try:
+            self.redis_client.delete(self._history_key(room_id))
+            return True
+        except Exception as e:
+            logger.error(f"대화 기록 캐시 삭제 실패 (room {room_id}): {e}")
+            return False
@@ -0,0 +1,84 @@
+from typing import Iterable, Set
+from sqlalchemy.orm import Session
+from core.redis_client import get_redis_client
+from core.models import ChatroomMember, User
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 채팅방 멤버(firebase uid) 캐싱 (Redis Set)
+# 방 접근 권한 확인을 SQL 두 번 대신 SISMEMBER 한 번으로 처리
+class ChatMembershipCacheService:
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.members_ttl = 86400  # 24시간
+
+    def _members_key(self, room_id: int) -> str:
+        return f"chatroom:members:{room_id}"
+
+    # 방 멤버인지 확인 (EXISTS + SISMEMBER를 한 번의 왕복으로)
+    # 캐시가 없거나 Redis 오류면 DB에서 멤버 목록을 읽어 캐시를 채움
+    def is_member(self, room_id: int, uid: str, db: Session) -> bool:
+        try:
+            key = self._members_key(room_id)
+            pipeline = self.redis_client.pipeline(transaction=False)
+            pipeline.exists(key)
+            pipeline.sismember(key, uid)
+            key_exists, is_member = pipeline.execute()
+            if key_exists:
+                return bool(is_member)
+        except Exception as e:
+            logger.error(f"멤버 캐시 조회 실패 (room {room_id}): {e}")
+
+        return uid in self.load_members(room_id, db)
+
+    # 방 멤버 uid 전체 조회 (캐시 우선)
+    def get_members(self, room_id: int, db: Session) -> Set[str]:
+        try:
+            members = self.redis_client.smembers(self._members_key(room_id))
+            if members:
+                return set(members)
+        except Exception as e:
+            logger.error(f"멤버 캐시 조회 실패 (room {room_id}): {e}")
+
+        return self.load_members(room_id, db)
+
+    # DB에서 방 멤버를 읽어 캐시에 저장
+    def load_members(self, room_id: int, db: Session) -> Set[str]:
+        rows = (
+            db.query(User.firebase_uid)
+            .join(ChatroomMember, ChatroomMember.user_id == User.id)
+            .filter(ChatroomMember.chatroom_id == room_id)
+            .all()
+        )
+        member_uids = {row[0] for row in rows}
+        if member_uids:
+            self.set_members(room_id, member_uids)
+        return member_uids
+
+    # 방 생성 시 멤버 목록 저장
+    def set_members(self, room_id: int, member_uids: Iterable[str]) -> bool:
+        member_uids = list(member_uids)
+        if not member_uids:
+            return False
+        try:
+            key = self._members_key(room_id)
+            pipeline = self.redis_client.pipeline(transaction=True)
+            pipeline.delete(key)
+            pipeline.sadd(key, *member_uids)
+            pipeline.expire(key, self.members_ttl)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"멤버 캐시 저장 실패 (room {room_id}): {e}")
+            return False
+
+    # 방 삭제 시 캐시 제거
+    def invalidate(self, room_id: int) -> bool:
+        try:
+            self.redis_client.delete(self._members_key(room_id))
+            return True
+        except Exception as e:
+            logger.error(f"멤버 캐시 삭제 실패 (room {room_id}): {e}")
+            return False
@@ -0,0 +1,94 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from core.db import SessionLocal
+from core.models import ChatMessage
+from services.chat_history_cache_service import ChatHistoryCacheService
+from services.chat_stream_service import ChatStreamService
+from services.chat_unread_service import ChatUnreadService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 커밋 전까지 session.info에 모아두는 새 메시지 목록 키
+PENDING_MESSAGES_KEY = "pending_chat_messages"
+
+_history_cache_service: Optional[ChatHistoryCacheService] = None
+_stream_service: Optional[ChatStreamService] = None
+_unread_service: Optional[ChatUnreadService] = None
+
+
+# Redis 연결은 처음 사용할 때 생성 (import 시점에 Redis가 없어도 서버는 뜨도록)
+def get_history_cache_service() -> ChatHistoryCacheService:
+    global _history_cache_service
+    if _history_cache_service is None:
+        _history_cache_service = ChatHistoryCacheService()
+    return _history_cache_service
+
+
+def get_stream_service() -> ChatStreamService:
+    global _stream_service
+    if _stream_service is None:
+        _stream_service = ChatStreamService()
+    return _stream_service
+
+
+def get_unread_service() -> ChatUnreadService:
+    global _unread_service
+    if _unread_service is None:
+        _unread_service = ChatUnreadService()
+    return _unread_service
+
+
+# ChatMessage → 캐시 / 이벤트용 dict
+def serialize_chat_message(msg: ChatMessage) -> Dict[str, Any]:
+    return {
+        "id": msg.id,
+        "room_id": msg.room_id,
+        "sender_id": msg.sender_id,
+        "role": msg.role,
+        "content": msg.content,
+        "message_type": msg.message_type or "text",
+        "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
+    }
+
+
+# 현재 세션에서 flush됐지만 아직 커밋되지 않은 특정 방의 메시지
+def get_pending_chat_messages(db: Session, room_id: int) -> List[Dict[str, Any]]:
+    return [m for m in db.info.get(PENDING_MESSAGES_KEY, []) if m["room_id"] == room_id]
+
+
+# flush 직후: id가 붙은 새 메시지를 직렬화해서 보관 (커밋 후에는 속성이 만료되므로 여기서)
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_new_messages(session: Session, flush_context):
+    new_messages = [obj for obj in session.new if isinstance(obj, ChatMessage)]
+    if new_messages:
+        pending = session.info.setdefault(PENDING_MESSAGES_KEY, [])
+        pending.extend(serialize_chat_message(m) for m in new_messages)
+
+
+# 커밋 성공 후: 방별 최근 대화 버퍼 / 재접속용 메시지 스트림에 추가, 멤버별 안 읽은 수 증가
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_committed_messages(session: Session):
+    pending = session.info.pop(PENDING_MESSAGES_KEY, [])
+    if not pending:
+        return
+
+    messages_by_room = defaultdict(list)
+    for message in pending:
+        messages_by_room[message["room_id"]].append(message)
+
+    for room_id, messages in messages_by_room.items():
+        try:
+            get_history_cache_service().append_messages(room_id, messages)
+            get_stream_service().append_messages(room_id, messages)
+            get_unread_service().add_messages(room_id, messages)
+        except Exception as e:
+            logger.error(f"커밋된 메시지 후처리 실패 (room {room_id}): {e}")
+
+
+# 롤백 시 보관 중이던 메시지 폐기
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending_messages(session: Session):
+    session.info.pop(PENDING_MESSAGES_KEY, None)
@@ -0,0 +1,133 @@
+import json
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from core.db import SessionLocal
+from core.models import ChatRoom
+from core.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 대화 단계
+STAGE_IDLE = "idle"                      # 메뉴 고르는 중
+STAGE_MENU_SELECTED = "menu_selected"    # 메뉴 선택 완료, 위치 선택 대기
+STAGE_RECOMMENDED = "recommended"        # 식당 추천 완료
+
+# 커밋 전까지 session.info에 모아두는 상태 변경 키
+PENDING_STATE_KEY = "pending_chat_state"
+
+MAX_SUGGESTED_FOODS = 5
+
+_chat_state_service: Optional["ChatStateService"] = None
+
+
+# 채팅방별 대화 상태 (Redis Hash)
+# stage / selected_menu / suggested_foods / last_location
+# MySQL(ChatRoom.selected_menu)은 기록용으로만 같이 저장하고, 턴 처리 중 읽기는 여기서
+class ChatStateService:
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.state_ttl = 86400  # 24시간
+
+    def _state_key(self, room_id: int) -> str:
+        return f"chatroom:state:{room_id}"
+
+    # 방 상태 조회, 캐시가 없으면 MySQL 기록으로 채움
+    def get_state(self, room_id: int, chatroom: ChatRoom = None, db: Session = None) -> Dict[str, Any]:
+        try:
+            raw = self.redis_client.hgetall(self._state_key(room_id))
+            if raw:
+                return self._decode(raw)
+        except Exception as e:
+            logger.error(f"대화 상태 조회 실패 (room {room_id}): {e}")
+
+        if chatroom is None and db is not None:
+            chatroom = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+
+        selected_menu = chatroom.selected_menu if chatroom else None
+        state = {
+            "stage": STAGE_MENU_SELECTED if selected_menu else STAGE_IDLE,
+            "selected_menu": selected_menu,
+            "suggested_foods": [selected_menu] if selected_menu else [],
+            "last_location": None,
+        }
+        self.set_state(room_id, state)
+        return state
+
+    # 여러 필드를 한 번에 갱신 (MULTI/EXEC), 값이 None이면 필드 삭제
+    def set_state(self, room_id: int, fields: Dict[str, Any]) -> bool:
+        try:
+            key = self._state_key(room_id)
+            to_set = {name: self._encode(value) for name, value in fields.items() if value is not None}
+            to_delete = [name for name, value in fields.items() if value is None]
+
+            pipeline = self.redis_client.pipeline(transaction=True)
+            if to_set:
+                pipeline.hset(key, mapping=to_set)
+            if to_delete:
+                pipeline.hdel(key, *to_delete)
+            pipeline.expire(key, self.state_ttl)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"대화 상태 저장 실패 (room {room_id}): {e}")
+            return False
+
+    def invalidate(self, room_id: int) -> bool:
+        try:
+            self.redis_client.delete(self._state_key(room_id))
+            return True
+        except Exception as e:
+            logger.error(f"대화 상태 삭제 실패 (room {room_id}): {e}")
+            return False
+
+    def _encode(self, value: Any) -> str:
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value)
+
+    def _decode(self, raw: Dict[str, str]) -> Dict[str, Any]:
+        return {
+            "stage": raw.get("stage", STAGE_IDLE),
+            "selected_menu": raw.get("selected_menu"),
+            "suggested_foods": json.loads(raw["suggested_foods"]) if raw.get("suggested_foods") else [],
+            "last_location": json.loads(raw["last_location"]) if raw.get("last_location") else None,
+        }
+
+
+# Redis 연결은 처음 사용할 때 생성
+def get_chat_state_service() -> ChatStateService:
+    global _chat_state_service
+    if _chat_state_service is None:
+        _chat_state_service = ChatStateService()
+    return _chat_state_service
+
+
+# 선택 메뉴를 최근 제안 음식 목록 맨 뒤에 추가 (중복 제거, 최대 MAX_SUGGESTED_FOODS개)
+def push_suggested_food(suggested_foods: List[str], food: str) -> List[str]:
+    foods = [f for f in suggested_foods if f != food] + [food]
+    return foods[-MAX_SUGGESTED_FOODS:]
+
+
+# 턴 처리 중 상태 변경 예약 - 커밋이 성공하면 Redis에 반영, 롤백되면 버림
+def queue_state_update(db: Session, room_id: int, **fields):
+    pending = db.info.setdefault(PENDING_STATE_KEY, {})
+    pending.setdefault(room_id, {}).update(fields)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_committed_state(session: Session):
+    pending = session.info.pop(PENDING_STATE_KEY, None)
+    if not pending:
+        return
+
+    service = get_chat_state_service()
+    for room_id, fields in pending.items():
+        service.set_state(room_id, fields)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending_state(session: Session):
+    session.info.pop(PENDING_STATE_KEY, None)
@@ -0,0 +1,78 @@
+import json
+from typing import List, Dict, Any, Tuple
+from core.redis_client import get_redis_client
+from core.config import CHAT_STREAM_MAXLEN, CHAT_REPLAY_MAX_MESSAGES
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 채팅방별 메시지 스트림 (Redis Stream, 최근 CHAT_STREAM_MAXLEN개 정도로 제한)
+# 커밋된 메시지를 커밋 순서대로 쌓아두고, 재접속한 클라이언트에게 놓친 메시지만 다시 보내는 데 사용
+class ChatStreamService:
+
+    def __init__(self, max_len: int = CHAT_STREAM_MAXLEN):
+        self.redis_client = get_redis_client()
+        self.max_len = max_len
+        self.stream_ttl = 604800  # 7일 (조용한 방은 스트림이 사라지고, 재접속 시 전체 다시 불러오기)
+
+    def _stream_key(self, room_id: int) -> str:
+        return f"chatroom:stream:{room_id}"
+
+    # 커밋된 메시지 추가, MAXLEN ~ 로 오래된 항목은 대략적으로 잘라냄 (trim 비용 최소화)
+    def append_messages(self, room_id: int, messages: List[Dict[str, Any]]) -> bool:
+        if not messages:
+            return False
+        try:
+            key = self._stream_key(room_id)
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for message in messages:
+                pipeline.xadd(
+                    key,
+                    {"message_id": message["id"], "message": json.dumps(message, ensure_ascii=False)},
+                    maxlen=self.max_len,
+                    approximate=True,
+                )
+            pipeline.expire(key, self.stream_ttl)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"메시지 스트림 추가 실패 (room {room_id}): {e}")
+            return False
+
+    def read_since(
+        self, room_id: int, last_message_id: int, limit: int = CHAT_REPLAY_MAX_MESSAGES
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        (last_message_id 다음에 커밋된 메시지 목록, truncated) 반환
+        - 메시지 id가 아니라 스트림 안의 위치(커밋 순서) 기준으로 그 뒤의 항목을 돌려줌
+        - last_message_id가 스트림에 없거나(이미 잘려나감 / 스트림 만료) 놓친 메시지가 limit보다 많으면
+          truncated=True → 클라이언트는 전체 대화를 다시 불러와야 함
+        """
+        try:
+            entries = self.redis_client.xrange(self._stream_key(room_id), "-", "+")
+        except Exception as e:
+            logger.error(f"메시지 스트림 조회 실패 (room {room_id}): {e}")
+            return [], True
+
+        position = None
+        for index in range(len(entries) - 1, -1, -1):
+            if int(entries[index][1]["message_id"]) == last_message_id:
+                position = index
+                break
+
+        if position is None:
+            return [], True
+
+        missed = entries[position + 1:]
+        if len(missed) > limit:
+            return [], True
+        return [json.loads(fields["message"]) for _, fields in missed], False
+
+    def invalidate(self, room_id: int) -> bool:
+        try:
+            self.redis_client.delete(self._stream_key(room_id))
+            return True
+        except Exception as e:
+            logger.error(f"메시지 스트림 삭제 실패 (room {room_id}): {e}")
+            return False
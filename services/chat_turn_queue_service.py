@@ -0,0 +1,165 @@
+import os
+import json
+import socket
+from typing import List, Dict, Any, Optional, Tuple
+from core.redis_client import get_async_redis_client
+from core.config import CHAT_WORKER_PARTITIONS, CHAT_WORKER_LEASE_SECONDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 작업이 이 횟수보다 많이 전달되면(계속 실패/재시작) 버림
+MAX_DELIVERIES = 3
+
+# 점유 중인 worker만 점유 시간을 연장 (다른 worker가 이어받았으면 0)
+RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# (스트림 키, 항목 id, 작업)
+TurnJob = Tuple[str, str, Dict[str, Any]]
+
+
+# 채팅 턴 작업 큐 (파티션별 Redis Stream + consumer group)
+# 웹 프로세스는 enqueue만 하고 바로 반환, chat_worker.py가 read → 처리 → ack
+# - 방은 room_id % CHAT_WORKER_PARTITIONS 파티션 스트림 하나에만 들어가고,
+#   파티션은 점유(lease)를 가진 worker 하나만 읽으므로 같은 방의 턴은 들어온 순서대로 처리됨
+# - consumer 이름은 worker 번호로 고정: 재시작한 worker가 ACK되지 않은 자기 작업을 순서대로 다시 처리 (at-least-once)
+class ChatTurnQueueService:
+    stream_prefix = "chat:turn_jobs"
+    group_name = "chat-turn-workers"
+
+    def __init__(self, max_len: int = 10000, partitions: int = CHAT_WORKER_PARTITIONS):
+        self.redis_client = get_async_redis_client()
+        self.max_len = max_len
+        self.partitions = partitions
+
+    def stream_key(self, partition: int) -> str:
+        return f"{self.stream_prefix}:{partition}"
+
+    def _lease_key(self, worker_index: int) -> str:
+        return f"chat:turn:lease:{worker_index}"
+
+    # 방이 들어갈 파티션
+    def partition(self, room_id: int) -> int:
+        return room_id % self.partitions
+
+    # 턴 작업 추가, Redis 오류면 False
+    async def enqueue(self, room_id: int, uid: str, user: Any, message_content: str) -> bool:
+        job = {
+            "room_id": room_id,
+            "uid": uid,
+            "user_id": user.id,
+            "nickname": user.nickname,
+            "profile_image": user.profile_image,
+            "content": message_content,
+        }
+        try:
+            await self.redis_client.xadd(
+                self.stream_key(self.partition(room_id)),
+                {"job": json.dumps(job, ensure_ascii=False)},
+                maxlen=self.max_len,
+                approximate=True,
+            )
+            return True
+        except Exception as e:
+            logger.error(f"턴 작업 추가 실패 (room {room_id}): {e}")
+            return False
+
+    # 파티션별 consumer group 생성 (이미 있으면 무시)
+    async def ensure_groups(self, partitions: List[int]):
+        for partition in partitions:
+            try:
+                await self.redis_client.xgroup_create(
+                    self.stream_key(partition), self.group_name, id="0", mkstream=True
+                )
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    @staticmethod
+    def consumer_name(worker_index: int) -> str:
+        return f"worker-{worker_index}"
+
+    # 점유 확인용 프로세스 식별자
+    @staticmethod
+    def lease_token() -> str:
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    # worker 번호 점유 (이미 다른 프로세스가 점유 중이면 False)
+    async def acquire_lease(self, worker_index: int, token: str) -> bool:
+        acquired = await self.redis_client.set(
+            self._lease_key(worker_index), token, nx=True, ex=CHAT_WORKER_LEASE_SECONDS
+        )
+        return bool(acquired)
+
+    # 점유 시간 연장, 점유를 잃었으면 False
+    async def renew_lease(self, worker_index: int, token: str) -> bool:
+        renewed = await self.redis_client.eval(
+            RENEW_LEASE_SCRIPT, 1, self._lease_key(worker_index), token, CHAT_WORKER_LEASE_SECONDS
+        )
+        return bool(renewed)
+
+    async def release_lease(self, worker_index: int, token: str):
+        if await self.redis_client.get(self._lease_key(worker_index)) == token:
+            await self.redis_client.delete(self._lease_key(worker_index))
+
+    def _parse(self, response) -> List[TurnJob]:
+        return [
+            (stream, entry_id, json.loads(fields["job"]))
+            for stream, entries in (response or [])
+            for entry_id, fields in entries
+            # 그 사이 삭제된 항목은 fields가 비어 있음
+            if fields
+        ]
+
+    # 이 consumer가 받아두고 ACK하지 않은 작업 (이전 실행에서 처리하다 멈춘 작업), 스트림 순서대로
+    # 너무 여러 번 전달된 작업은 버림
+    async def read_pending(self, consumer: str, partitions: List[int]) -> List[TurnJob]:
+        for partition in partitions:
+            stream = self.stream_key(partition)
+            while True:
+                pending = await self.redis_client.xpending_range(
+                    stream, self.group_name, min="-", max="+", count=100, consumername=consumer
+                )
+                expired = [p["message_id"] for p in pending if p["times_delivered"] >= MAX_DELIVERIES]
+                if not expired:
+                    break
+                logger.warning(f"전달 횟수 초과로 버리는 턴 작업 ({stream}): {expired}")
+                await self.ack(stream, *expired)
+
+        response = await self.redis_client.xreadgroup(
+            self.group_name, consumer, {self.stream_key(p): "0" for p in partitions}
+        )
+        return self._parse(response)
+
+    # 담당 파티션의 새 작업 읽기 (없으면 block_ms 동안 대기)
+    async def read(
+        self, consumer: str, partitions: List[int], count: int, block_ms: int = 5000
+    ) -> List[TurnJob]:
+        response = await self.redis_client.xreadgroup(
+            self.group_name,
+            consumer,
+            {self.stream_key(p): ">" for p in partitions},
+            count=count,
+            block=block_ms,
+        )
+        return self._parse(response)
+
+    async def ack(self, stream: str, *entry_ids: str):
+        if entry_ids:
+            await self.redis_client.xack(stream, self.group_name, *entry_ids)
+            await self.redis_client.xdel(stream, *entry_ids)
+
+
+_turn_queue_service: Optional[ChatTurnQueueService] = None
+
+
+def get_turn_queue_service() -> ChatTurnQueueService:
+    global _turn_queue_service
+    if _turn_queue_service is None:
+        _turn_queue_service = ChatTurnQueueService()
+    return _turn_queue_service
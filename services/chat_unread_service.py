@@ -0,0 +1,91 @@
+from typing import Dict, Iterable, List, Any
+from core.db import session_scope
+from core.redis_client import get_redis_client
+from services.chat_membership_cache_service import ChatMembershipCacheService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 사용자별 안 읽은 메시지 수 (Redis Hash: user:unread:{uid} → {room_id: count})
+# 메시지가 커밋될 때 보낸 사람을 뺀 멤버들의 카운터를 올리고, 읽음 확인을 받으면 0으로 (필드 삭제)
+# 채팅방 목록은 HGETALL 한 번으로 모든 방의 안 읽은 수를 가져옴
+class ChatUnreadService:
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.membership_cache = ChatMembershipCacheService()
+        self.unread_ttl = 2592000  # 30일 (오래 안 들어온 사용자의 카운터는 정리)
+
+    def _unread_key(self, uid: str) -> str:
+        return f"user:unread:{uid}"
+
+    # 화면에 보이지 않는 메시지(오늘의 조언 원문, 위치 선택 태그)는 세지 않음
+    def _is_countable(self, message: Dict[str, Any]) -> bool:
+        if message["message_type"] == "hidden_initial":
+            return False
+        if message["role"] == "user" and (message["content"] or "").startswith("[LOCATION_SELECTED:"):
+            return False
+        return True
+
+    # 커밋된 메시지만큼 멤버별 카운터 증가 (한 번의 파이프라인)
+    # 메시지를 보낸 사용자는 방을 보고 있는 것이므로 자신의 카운터는 초기화
+    def add_messages(self, room_id: int, messages: List[Dict[str, Any]]) -> bool:
+        messages = [m for m in messages if self._is_countable(m)]
+        if not messages:
+            return False
+
+        # 멤버 캐시가 없을 때만 자체 세션으로 DB 조회
+        with session_scope() as db:
+            member_uids = self.membership_cache.get_members(room_id, db)
+
+        senders = {m["sender_id"] for m in messages}
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for member_uid in member_uids:
+                key = self._unread_key(member_uid)
+                if member_uid in senders:
+                    # 보낸 메시지 이후의 다른 사람 메시지만 남김
+                    last_sent = max(i for i, m in enumerate(messages) if m["sender_id"] == member_uid)
+                    unread = sum(1 for m in messages[last_sent + 1:] if m["sender_id"] != member_uid)
+                    pipeline.hdel(key, room_id)
+                else:
+                    unread = len(messages)
+                if unread:
+                    pipeline.hincrby(key, room_id, unread)
+                    pipeline.expire(key, self.unread_ttl)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"안 읽은 메시지 수 갱신 실패 (room {room_id}): {e}")
+            return False
+
+    # 읽음 확인: 해당 방 카운터 초기화
+    def mark_read(self, uid: str, room_id: int) -> bool:
+        try:
+            self.redis_client.hdel(self._unread_key(uid), room_id)
+            return True
+        except Exception as e:
+            logger.error(f"읽음 처리 실패 (user {uid}, room {room_id}): {e}")
+            return False
+
+    # {room_id: 안 읽은 수}, 조회 실패 시 빈 dict (목록은 0으로 표시)
+    def get_counts(self, uid: str) -> Dict[int, int]:
+        try:
+            raw = self.redis_client.hgetall(self._unread_key(uid))
+            return {int(room_id): int(count) for room_id, count in raw.items()}
+        except Exception as e:
+            logger.error(f"안 읽은 메시지 수 조회 실패 (user {uid}): {e}")
+            return {}
+
+    # 방 삭제 시 멤버들의 해당 방 카운터 제거
+    def clear_room(self, room_id: int, member_uids: Iterable[str]) -> bool:
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for member_uid in member_uids:
+                pipeline.hdel(self._unread_key(member_uid), room_id)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logger.error(f"안 읽은 메시지 수 삭제 실패 (room {room_id}): {e}")
+            return False
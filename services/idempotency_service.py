@@ -0,0 +1,163 @@
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from core.redis_client import get_redis_client
+from core.executor import run_blocking
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+
+# Idempotency-Key 헤더 처리 (Redis String: idem:{scope}:{uid}:{key})
+# - 첫 요청이 SET NX로 pending 기록을 잡고 처리, 끝나면 응답을 저장
+# - 같은 키로 다시 오면 저장된 응답을 그대로 돌려줌 (LLM 호출 / 예약 생성을 다시 하지 않음)
+# - 첫 요청이 아직 처리 중이면 끝날 때까지 기다렸다가 같은 응답을 돌려줌
+# - 처리 중 오류가 나면 기록을 지워서 재시도가 다시 처리되게 함
+#   (단, 되돌릴 수 없는 작업이 이미 커밋됐으면 호출하는 쪽에서 오류 응답을 complete로 저장)
+# Redis 장애 시에는 키 없이 처리 (중복 방지보다 요청 처리를 우선)
+class IdempotencyService:
+
+    def __init__(self, scope: str, pending_ttl: int = 60, response_ttl: int = 86400):
+        self.scope = scope
+        self.pending_ttl = pending_ttl      # 처리 중 기록 유지 시간 (처리 시간 상한보다 길게)
+        self.response_ttl = response_ttl   # 저장된 응답 유지 시간 (24시간)
+
+    # Redis가 내려가 있으면 연결 오류가 각 호출의 예외 처리로 넘어가도록 사용할 때 가져옴
+    # (생성자에서 실패하면 "키 없이 처리"로 넘어가지 못하고 요청 전체가 500)
+    @property
+    def redis_client(self):
+        return get_redis_client()
+
+    def _key(self, uid: str, idempotency_key: str) -> str:
+        return f"idem:{self.scope}:{uid}:{idempotency_key}"
+
+    # 같은 키가 다른 요청 본문에 재사용됐는지 확인하기 위한 지문
+    def _fingerprint(self, payload: Any) -> str:
+        raw = json.dumps(jsonable_encoder(payload), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_record(self, uid: str, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis_client.get(self._key(uid, idempotency_key))
+        return json.loads(raw) if raw else None
+
+    # 처리 권한을 잡으면 None, 이미 같은 키의 기록이 있으면 그 기록 반환
+    def _reserve(self, uid: str, idempotency_key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        pending = json.dumps({"state": STATE_PENDING, "fingerprint": fingerprint})
+        if self.redis_client.set(self._key(uid, idempotency_key), pending, nx=True, ex=self.pending_ttl):
+            return None
+        # 그 사이 기록이 만료됐으면 다시 시도
+        record = self._get_record(uid, idempotency_key)
+        if record is None:
+            return self._reserve(uid, idempotency_key, fingerprint)
+        return record
+
+    # 기록이 처리 완료면 저장된 응답, 처리 중이면 None
+    def _resolve(self, record: Dict[str, Any], fingerprint: str) -> Optional[JSONResponse]:
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=422, detail="같은 Idempotency-Key가 다른 요청에 사용되었습니다."
+            )
+        if record["state"] != STATE_DONE:
+            return None
+        return JSONResponse(
+            content=record["body"],
+            status_code=record["status_code"],
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    def _in_progress(self) -> HTTPException:
+        return HTTPException(
+            status_code=409, detail="같은 요청을 아직 처리하고 있습니다. 잠시 후 다시 시도해주세요."
+        )
+
+    # 동기 엔드포인트용: 새 요청이면 None(처리 진행), 중복이면 저장된 응답
+    def begin(self, uid: str, idempotency_key: str, payload: Any) -> Optional[JSONResponse]:
+        fingerprint = self._fingerprint(payload)
+        try:
+            record = self._reserve(uid, idempotency_key, fingerprint)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Idempotency 기록 확인 실패 ({self.scope}): {e}")
+            return None
+        if record is None:
+            return None
+
+        deadline = time.monotonic() + self.pending_ttl
+        while True:
+            response = self._resolve(record, fingerprint)
+            if response is not None:
+                return response
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            time.sleep(0.1)
+            record = self._get_record(uid, idempotency_key)
+            if record is None:
+                # 첫 요청이 실패해 기록이 지워짐 → 이 요청이 처리
+                return self.begin(uid, idempotency_key, payload)
+
+    # 비동기 엔드포인트용 (Redis 호출은 스레드풀에서, 기다리는 동안 이벤트 루프를 막지 않음)
+    async def begin_async(self, uid: str, idempotency_key: str, payload: Any) -> Optional[JSONResponse]:
+        fingerprint = self._fingerprint(payload)
+        try:
+            record = await run_blocking(self._reserve, uid, idempotency_key, fingerprint)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Idempotency 기록 확인 실패 ({self.scope}): {e}")
+            return None
+        if record is None:
+            return None
+
+        deadline = time.monotonic() + self.pending_ttl
+        while True:
+            response = self._resolve(record, fingerprint)
+            if response is not None:
+                return response
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            await asyncio.sleep(0.1)
+            record = await run_blocking(self._get_record, uid, idempotency_key)
+            if record is None:
+                return await self.begin_async(uid, idempotency_key, payload)
+
+    # 이미 처리 완료로 기록된 키인지 (큐 작업 재전달 확인용), 확인 실패 시 False (처리 진행)
+    def is_completed(self, uid: str, idempotency_key: str) -> bool:
+        try:
+            record = self._get_record(uid, idempotency_key)
+        except Exception as e:
+            logger.error(f"Idempotency 기록 확인 실패 ({self.scope}): {e}")
+            return False
+        return record is not None and record["state"] == STATE_DONE
+
+    # 처리 완료: 응답 저장
+    def complete(self, uid: str, idempotency_key: str, payload: Any, body: Any, status_code: int = 200):
+        try:
+            record = {
+                "state": STATE_DONE,
+                "fingerprint": self._fingerprint(payload),
+                "status_code": status_code,
+                "body": jsonable_encoder(body),
+            }
+            self.redis_client.set(
+                self._key(uid, idempotency_key),
+                json.dumps(record, ensure_ascii=False),
+                ex=self.response_ttl,
+            )
+        except Exception as e:
+            logger.error(f"Idempotency 응답 저장 실패 ({self.scope}): {e}")
+
+    # 처리 실패: 기록 삭제 (재시도가 다시 처리)
+    def release(self, uid: str, idempotency_key: str):
+        try:
+            self.redis_client.delete(self._key(uid, idempotency_key))
+        except Exception as e:
+            logger.error(f"Idempotency 기록 삭제 실패 ({self.scope}): {e}")
@@ -0,0 +1,77 @@
+import re
+import json
+import hashlib
+from typing import List, Optional
+from core.redis_client import get_redis_client
+from core.config import LLM_RESPONSE_CACHE_TTL
+import logging
+
+logger = logging.getLogger(__name__)
+
+MENTION_TAG = "@밥풀이"
+
+# 텍스트 정규화: 멘션 제거 + 공백 정리 + 소문자
+def normalize_llm_text(text: str) -> str:
+    if not text:
+        return ""
+    text = text.replace(MENTION_TAG, "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+# 동일한 LLM 요청(사용자 메시지 + 오행 상태 + 추천 메뉴 + 대화 기록)의 응답 캐싱
+class LLMResponseCacheService:
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.response_ttl = LLM_RESPONSE_CACHE_TTL
+
+    def _response_key(self, digest: str) -> str:
+        return f"llm:response:{digest}"
+
+    # 캐시 키용 요청 digest
+    # 대화 기록 끝에 붙어 있는 현재 사용자 메시지는 user_message로 따로 들어가므로 제외
+    # (재전송이나 동시에 같은 말을 보낸 경우에도 같은 키가 되도록)
+    def build_digest(
+        self,
+        conversation_history: str,
+        user_message: str,
+        current_recommended_foods: List[str] = None,
+        oheng_info_text: str = "",
+    ) -> str:
+        normalized_message = normalize_llm_text(user_message)
+
+        history_lines = [
+            normalize_llm_text(line) for line in (conversation_history or "").splitlines()
+        ]
+        history_lines = [line for line in history_lines if line]
+        # 대화 기록 줄은 "사용자: 메시지" 형식
+        while history_lines and history_lines[-1] in (normalized_message, f"사용자: {normalized_message}"):
+            history_lines.pop()
+
+        payload = json.dumps(
+            [
+                normalized_message,
+                normalize_llm_text(oheng_info_text),
+                sorted(current_recommended_foods or []),
+                hashlib.sha256("\n".join(history_lines).encode("utf-8")).hexdigest(),
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_response(self, digest: str) -> Optional[str]:
+        try:
+            return self.redis_client.get(self._response_key(digest))
+        except Exception as e:
+            logger.error(f"LLM 응답 캐시 조회 실패: {e}")
+            return None
+
+    def set_response(self, digest: str, response_text: str) -> bool:
+        if not response_text:
+            return False
+        try:
+            self.redis_client.setex(self._response_key(digest), self.response_ttl, response_text)
+            return True
+        except Exception as e:
+            logger.error(f"LLM 응답 캐시 저장 실패: {e}")
+            return False
@@ -0,0 +1,127 @@
+import json
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+from core.models import Restaurant
+from services.restaurant_cache_service import RestaurantCacheService
+import logging
+
+logger = logging.getLogger(__name__)
+
+CARD_MESSAGE_TYPE = "restaurant_cards"
+
+
+# 식당 image 컬럼(쉼표로 구분된 URL 목록)에서 첫 번째 URL
+def first_image_url(image: Optional[str]) -> Optional[str]:
+    if not image:
+        return None
+    first = image.split(',')[0].strip()
+    if first.startswith(("'", '"')) and first.endswith(("'", '"')):
+        first = first[1:-1]
+    return first or None
+
+
+# 카드 메시지 저장용 참조: 식당 id, 거리, 순위만 저장
+# {"refs": [{"id": 1, "distance_m": 350, "rank": 1}, ...], "count": 3}
+def build_card_reference(restaurants: List[Dict[str, Any]], count: int = None) -> str:
+    refs = [
+        {"id": r["id"], "distance_m": r.get("distance_m"), "rank": rank}
+        for rank, r in enumerate(restaurants, start=1)
+    ]
+    return json.dumps(
+        {"refs": refs, "count": count if count is not None else len(refs)},
+        ensure_ascii=False,
+    )
+
+
+# 참조로 저장된 카드 메시지를 식당 요약 캐시로 채워 기존 카드 형식으로 변환
+# 예전 방식(식당 정보 전체가 들어있는) 카드는 그대로 반환
+class RestaurantCardService:
+
+    def __init__(self):
+        self.cache_service = RestaurantCacheService()
+
+    def hydrate_content(self, content: str, db: Session = None) -> str:
+        return self.hydrate_contents([content], db)[0]
+
+    # 여러 카드 메시지를 한 번의 파이프라인 조회로 채움
+    def hydrate_contents(self, contents: List[str], db: Session = None) -> List[str]:
+        parsed: List[Optional[Dict[str, Any]]] = []
+        restaurant_ids: List[int] = []
+        for content in contents:
+            try:
+                card = json.loads(content) if content else None
+            except ValueError:
+                card = None
+            if isinstance(card, dict) and "refs" in card:
+                parsed.append(card)
+                restaurant_ids.extend(ref["id"] for ref in card["refs"])
+            else:
+                parsed.append(None)
+
+        if not restaurant_ids:
+            return contents
+
+        summaries = self._get_summaries(list(dict.fromkeys(restaurant_ids)), db)
+
+        hydrated = []
+        for content, card in zip(contents, parsed):
+            if card is None:
+                hydrated.append(content)
+                continue
+
+            restaurants = []
+            for ref in sorted(card["refs"], key=lambda r: r.get("rank", 0)):
+                summary = summaries.get(ref["id"])
+                if not summary:
+                    continue
+                distance_m = ref.get("distance_m")
+                restaurants.append({
+                    "id": ref["id"],
+                    "name": summary["name"],
+                    "category": summary["category"],
+                    "address": summary["address"],
+                    "lat": summary["latitude"],
+                    "lon": summary["longitude"],
+                    "distance_km": round(distance_m / 1000, 2) if distance_m is not None else None,
+                    "distance_m": distance_m,
+                    "image": first_image_url(summary["image"]),
+                    "rating": summary.get("rating"),
+                    "review_count": summary.get("review_count"),
+                })
+
+            hydrated.append(json.dumps(
+                {"restaurants": restaurants, "count": card.get("count", len(restaurants))},
+                ensure_ascii=False,
+            ))
+        return hydrated
+
+    # 카드 메시지 dict 목록의 content를 제자리에서 채움
+    def hydrate_messages(self, messages: List[Dict[str, Any]], db: Session = None) -> List[Dict[str, Any]]:
+        card_messages = [m for m in messages if m.get("message_type") == CARD_MESSAGE_TYPE]
+        if card_messages:
+            contents = self.hydrate_contents([m["content"] for m in card_messages], db)
+            for message, content in zip(card_messages, contents):
+                message["content"] = content
+        return messages
+
+    # Redis 요약 캐시 조회, 캐시에 없는 식당만 DB에서 보충
+    def _get_summaries(self, restaurant_ids: List[int], db: Session = None) -> Dict[int, Dict[str, Any]]:
+        try:
+            summaries = self.cache_service.get_summaries_by_ids(restaurant_ids)
+        except Exception as e:
+            logger.error(f"식당 요약 캐시 조회 실패: {e}")
+            summaries = {}
+
+        missing_ids = [r_id for r_id in restaurant_ids if r_id not in summaries]
+        if missing_ids and db is not None:
+            for restaurant in db.query(Restaurant).filter(Restaurant.id.in_(missing_ids)).all():
+                summaries[restaurant.id] = {
+                    "id": restaurant.id,
+                    "name": restaurant.name,
+                    "category": restaurant.category,
+                    "address": restaurant.address,
+                    "image": restaurant.image,
+                    "latitude": restaurant.latitude,
+                    "longitude": restaurant.longitude,
+                }
+        return summaries
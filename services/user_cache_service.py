@@ -188,4 +188,37 @@ class UserCacheService:
             
         except Exception as e:
             logger.error(f"오형 캐시 저장 실패: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    # 4. 사용자별 오늘의 오행 조언(채팅방 초기 메시지) 캐싱
+    def _user_daily_advice_key(self, uid: str, target_date: date) -> str:
+        return f"user:advice:{uid}:{target_date.isoformat()}"
+    
+    def get_user_daily_advice(self, uid: str, target_date: date) -> Optional[str]:
+        try:
+            key = self._user_daily_advice_key(uid, target_date)
+            advice = self.redis_client.get(key)
+            
+            if advice:
+                logger.info(f"조언 캐시 HIT: {uid} - {target_date}")
+                return advice
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"조언 캐시 조회 실패: {e}")
+            return None
+    
+    def set_user_daily_advice(self, uid: str, target_date: date, advice: str) -> bool:
+        try:
+            key = self._user_daily_advice_key(uid, target_date)
+            
+            # 24시간 캐싱
+            self.redis_client.setex(key, self.iljin_ttl, advice)
+            
+            logger.info(f"조언 캐시 저장: {uid} - {target_date}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"조언 캐시 저장 실패: {e}")
+            return False
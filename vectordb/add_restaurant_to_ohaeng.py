@@ -5,11 +5,10 @@ from langchain_chroma import Chroma
 from sqlalchemy.orm import Session
 from langchain_core.documents import Document
 from typing import List, Dict, Any
-import time 
-import re  
 from core.db import SessionLocal 
 from core.models import Restaurant 
-from core.config import GEMMA_API_KEY 
+from core.config import GEMMA_API_KEY, LLM_TIMEOUT_SECONDS
+from core.llm_gateway import LLMGateway
 from vectordb.vectordb_util import (
     get_chroma_client_and_collection,
     COLLECTION_NAME_RESTAURANTS,
@@ -19,15 +18,28 @@ from vectordb.vectordb_util import (
 ) 
 
 # LLM API 설정
-client = None
+llm_gateway = None
 model_name = "gemma-3-4b-it"
 
 # 지연 로드(Lazy Load) 방식으로 LLM 연결
-def get_llm_client() -> genai.Client:
-    global client
-    if client is None:
-        client = genai.Client(api_key=GEMMA_API_KEY)
-    return client
+# 배치 작업이므로 동시 호출은 1개, 429는 서버 안내 시간만큼 기다리며 최대 5번 시도 (circuit breaker 없음)
+def get_llm_gateway() -> LLMGateway:
+    global llm_gateway
+    if llm_gateway is None:
+        client = genai.Client(
+            api_key=GEMMA_API_KEY,
+            http_options=types.HttpOptions(timeout=int(LLM_TIMEOUT_SECONDS * 1000)),
+        )
+        llm_gateway = LLMGateway(
+            client,
+            name="ohaeng_labeler",
+            max_concurrency=1,
+            deadline_seconds=300,
+            max_retries=4,
+            # 한 식당에서 재시도가 소진돼도 circuit이 열려 뒤 식당들이 건너뛰어지지 않도록 사용하지 않음
+            failure_threshold=float("inf"),
+        )
+    return llm_gateway
 
 SYSTEM_PROMPT = """
     당신은 식당의 카테고리, 메뉴를 분석하여 동양 철학의 오행(五行: 木, 火, 土, 金, 水) 중 해당 식당이 가장 강하게 반영하는 상위 3개의 기운을 판별하는 전문가입니다.
@@ -151,43 +163,16 @@ def add_ohang_all_restaurants():
                 user_query = create_user_query(content, ohaeng_docs) 
                 combined_query = SYSTEM_PROMPT + "\n\n--- 식당 분석 요청 ---\n\n" + user_query
     
-                # LLM API 호출 시 안정성을 위한 재시도 로직: 최대 5번 API 호출을 시도
-                for attempt in range(5):
-                    try:
-                        # LLM API 호출
-                        client = get_llm_client()
-                        
-                        response = client.models.generate_content(
-                            model=model_name,
-                            contents=[
-                                # 시스템 프롬포트와 식당 분석 요청 쿼리 결합
-                                types.Content(role="user", parts=[types.Part(text=combined_query)])
-                            ],
-                            config=types.GenerateContentConfig(temperature=0)
-                        )
-                        break # API 호출 성공하면 루프 탈출해 다음 로직 실행
-                        
-                    except Exception as e:
-                        error_message = str(e)
-                        # 429 에러 발생 시 (할당량 초과)
-                        if "429 RESOURCE_EXHAUSTED" in error_message:
-                            # 에러 메시지에서 서버가 권장하는 재시도 대기 시간(초)을 정규 표현식으로 추출
-                            match = re.search(r"Please retry in (\d+\.?\d*)s", error_message)
-                            # 서버 권장 시간이 있으면 사용하고, 없으면 5초
-                            current_delay = float(match.group(1)) if match else 5
-                            
-                            # 마지막 시도가 아닌 경우 로그 출력 후 대기
-                            if attempt < 5 - 1:
-                                print(f"429 할당량 초과: {current_delay:.2f}초 후 재시도 (시도 {attempt + 1}/{5})")
-                                time.sleep(current_delay + 1) # 서버 권장 시간보다 1초 더 기다림
-                            else:
-                                raise # 마지막 시도인 경우 해당 식당 건너뛰기
-                        else:
-                            raise # 429 외의 다른 에러인 경우에도 해당 식당 건너뛰기
+                # LLM API 호출: 재시도(429 안내 시간 준수) / 타임아웃은 게이트웨이가 처리
+                response = get_llm_gateway().generate_content(
+                    model=model_name,
+                    contents=[
+                        # 시스템 프롬포트와 식당 분석 요청 쿼리 결합
+                        types.Content(role="user", parts=[types.Part(text=combined_query)])
+                    ],
+                    config=types.GenerateContentConfig(temperature=0)
+                )
 
-                if response is None:
-                    raise Exception("LLM 호출 최대 재시도 횟수 초과")
-                    
                 # LLM 응답 파싱
                 response_text = response.text.strip()
                 start = response_text.find('[')